@@ -0,0 +1,38 @@
+import os, tempfile
+from typing import Optional
+from bench.fake_supabase import FakeSupabase
+from bench.stubs import StubAnthropic, StubGist
+from bench.datasets import PROFILES, seed
+
+
+def install(profile: str = "ci", db_latency: float = 0.0, db_jitter: float = 0.0,
+            llm_latency: float = 0.0, gist_latency: float = 0.0, replica_path: Optional[str] = None):
+    """
+    Import the API with the in-memory Supabase, Anthropic and Gist stand-ins in the client registry
+
+    :param replica_path: Serve reads from a SQLite read replica at this path, loaded before returning
+    :return app, db, gist: The FastAPI app plus the fakes behind it
+    """
+    from utils import clients
+    from utils.metrics import instrument_client
+
+    db = FakeSupabase(latency=db_latency, jitter=db_jitter)
+    seed(db, **PROFILES[profile])
+    gist = StubGist(latency=gist_latency)
+    StubAnthropic.latency = llm_latency
+
+    clients.override("supabase", instrument_client(db))
+    clients.override("anthropic", StubAnthropic())
+    clients.override("gist", gist)
+
+     # A fresh shared cache for every run: entries left by a previous run describe a different dataset
+    os.environ.setdefault("CACHE_PATH", os.path.join(tempfile.mkdtemp(prefix="bench-cache-"), "cache.sqlite3"))
+
+    if replica_path:
+        os.environ["READ_REPLICA"] = "1"
+        os.environ["REPLICA_PATH"] = replica_path
+
+    import main
+    if replica_path:
+        main.replica.load()
+    return main.app, db, gist
@@ -0,0 +1,99 @@
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Dict
+
+CATEGORIES = ['mental', 'physical', 'social', 'financial']
+PATTERNS = ['daily', 'weekly', 'monthly', 'every 3 days']
+WORDS = (
+    "read write run lift plan budget call review practice study build refactor deploy cook clean "
+    "journal stretch meditate invest save email meet design sketch learn piano spanish react python"
+).split()
+
+# Named dataset sizes: ci keeps a CI run under a minute, full is the 10k / 100k target
+PROFILES = {
+    "ci": {"tasks": 500, "completions": 5000, "tag_depth": 3, "tag_fanout": 3},
+    "full": {"tasks": 10000, "completions": 100000, "tag_depth": 5, "tag_fanout": 3},
+}
+
+
+def _sentence(rng, low, high):
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(low, high)))
+
+
+def seed(db, tasks: int = 10000, completions: int = 100000, tag_depth: int = 5,
+         tag_fanout: int = 3, seed: int = 42) -> Dict[str, int]:
+    """
+    Fill a FakeSupabase with a deterministic synthetic dataset
+
+    :param db: The FakeSupabase instance to load
+    :param tag_depth: Depth of the tag tree under every category
+    :param tag_fanout: Children per tag
+    :return sizes: Row count per table
+    """
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc)
+
+ # Tag trees: tag_fanout roots per category, tag_fanout children per node, tag_depth levels
+    tags, leaves = [], {category: [] for category in CATEGORIES}
+    for category in CATEGORIES:
+        level = [None]
+        for depth in range(tag_depth):
+            next_level = []
+            for parent_id in level:
+                for i in range(tag_fanout):
+                    tag = {
+                        "id": len(tags) + 1,
+                        "name": f"{category.title()} {depth}.{i} {rng.choice(WORDS).title()}",
+                        "parent_tag_id": parent_id,
+                        "category": category
+                    }
+                    tags.append(tag)
+                    next_level.append(tag['id'])
+            level = next_level
+        leaves[category] = level
+
+    task_rows, task_tags = [], []
+    for task_id in range(1, tasks + 1):
+        category = rng.choice(CATEGORIES)
+        recurring = rng.random() < 0.2
+        created = now - timedelta(days=rng.randint(0, 365))
+        task_rows.append({
+            "id": task_id,
+            "title": _sentence(rng, 2, 5),
+            "description": _sentence(rng, 5, 20),
+            "category": category,
+            "priority": rng.randint(1, 5),
+            "due_date": (now + timedelta(hours=rng.randint(-72, 240))).isoformat(),
+            "is_recurring": recurring,
+            "recurrence_pattern": rng.choice(PATTERNS) if recurring else None,
+            "is_active": rng.random() < 0.7,
+            "created_at": created.isoformat(),
+            "updated_at": created.isoformat()
+        })
+        for tag_id in rng.sample(leaves[category], k=min(len(leaves[category]), rng.randint(1, 3))):
+            task_tags.append({"id": len(task_tags) + 1, "task_id": task_id, "tag_id": tag_id})
+
+    completion_rows = []
+    for completion_id in range(1, completions + 1):
+        task = task_rows[rng.randrange(len(task_rows))]
+        late = rng.random() < 0.25
+        points = task['priority'] * 10
+        completion_rows.append({
+            "id": completion_id,
+            "task_id": task['id'],
+            "completed_at": (now - timedelta(minutes=rng.randint(0, 365 * 24 * 60))).isoformat(),
+            "completion_quality": rng.randint(1, 5),
+            "notes": _sentence(rng, 0, 12),
+            "was_late": late,
+            "time_spent_minutes": rng.randint(5, 240),
+            "points": -points if late else points
+        })
+
+    db.load("tags", tags)
+    db.load("tasks", task_rows)
+    db.load("task_tags", task_tags)
+    db.load("task_completions", completion_rows)
+    for table in ("notifications", "daily_rollups", "task_streaks"):
+        db.load(table, [])
+
+    return {table: len(db.rows(table)) for table in db.tables}
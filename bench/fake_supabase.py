@@ -0,0 +1,390 @@
+import re, time, random, threading
+from copy import deepcopy
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+from postgrest.exceptions import APIError
+
+# Columns the real tables fill in on insert
+DEFAULTS = {
+    "tasks": lambda: {"is_active": True, "is_recurring": False, "created_at": _now(), "updated_at": _now()},
+    "task_completions": lambda: {"completed_at": _now(), "was_late": False},
+}
+
+# PostgREST's db-max-rows: no response carries more rows than this, whatever the range asked for
+MAX_ROWS = 1000
+
+# child table -> [(column, parent table)], the foreign keys a delete must not leave dangling
+FOREIGN_KEYS = {
+    "notifications": [("task_id", "tasks")],
+    "task_completions": [("task_id", "tasks")],
+    "task_streaks": [("task_id", "tasks")],
+    "task_tags": [("task_id", "tasks"), ("tag_id", "tags")],
+    "tags": [("parent_tag_id", "tags")],
+}
+
+_EMBED = re.compile(r'(\w+)\(([^)]*)\)')
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat()
+
+
+class FakeResponse:
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+
+class FakeQuery:
+    """
+    The subset of the postgrest builder used by the API:
+    select/insert/update/upsert/delete + eq/neq/gt/gte/lt/lte/is_/in_ + order/range/limit + execute
+    """
+
+    def __init__(self, db, table):
+        self.db = db
+        self.table = table
+        self.action = "select"
+        self.columns = "*"
+        self.payload = None
+        self.on_conflict = None
+        self.filters = []
+        self.ordering = []
+        self.window = None
+
+    # Actions
+    def select(self, columns="*", count=None):
+        self.action, self.columns = "select", columns
+        return self
+
+    def insert(self, payload):
+        self.action, self.payload = "insert", payload
+        return self
+
+    def update(self, payload):
+        self.action, self.payload = "update", payload
+        return self
+
+    def upsert(self, payload, on_conflict=None):
+        self.action, self.payload, self.on_conflict = "upsert", payload, on_conflict
+        return self
+
+    def delete(self):
+        self.action = "delete"
+        return self
+
+    # Filters
+    def _filter(self, column, op, value):
+        self.filters.append((column, op, value))
+        return self
+
+    def eq(self, column, value):
+        return self._filter(column, "eq", value)
+
+    def neq(self, column, value):
+        return self._filter(column, "neq", value)
+
+    def gt(self, column, value):
+        return self._filter(column, "gt", value)
+
+    def gte(self, column, value):
+        return self._filter(column, "gte", value)
+
+    def lt(self, column, value):
+        return self._filter(column, "lt", value)
+
+    def lte(self, column, value):
+        return self._filter(column, "lte", value)
+
+    def is_(self, column, value):
+        return self._filter(column, "is", None if value in (None, "null") else value)
+
+    def in_(self, column, values):
+        return self._filter(column, "in", set(values))
+
+    # Modifiers
+    def order(self, column, desc=False):
+        self.ordering.append((column, desc))
+        return self
+
+    def range(self, start, end):
+        self.window = (start, end + 1)
+        return self
+
+    def limit(self, size):
+        self.window = (0, size)
+        return self
+
+    def execute(self):
+        return self.db._execute(self)
+
+
+class FakeRpc:
+    """A call to one of the Postgres functions in README.md, run in Python"""
+
+    def __init__(self, db, name, params):
+        self.db = db
+        self.name = name
+        self.params = params
+
+    def execute(self):
+        return self.db._rpc(self.name, self.params)
+
+
+class FakeSupabase:
+    """
+    In-memory stand-in for a supabase Client with optional injected per-query latency
+
+    :param latency: Seconds slept on every execute() (blocking, like the real sync client)
+    :param jitter: Extra uniform random latency on top, in seconds
+    """
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, seed: int = 0):
+        self.latency = latency
+        self.jitter = jitter
+        self.tables: Dict[str, List[dict]] = {}
+        self.next_id: Dict[str, int] = {}
+        self.calls = 0
+        self._indexes: Dict[tuple, dict] = {}
+        self._random = random.Random(seed)
+        self._lock = threading.RLock()
+
+    def table(self, name):
+        return FakeQuery(self, name)
+
+    def rpc(self, name, params=None):
+        return FakeRpc(self, name, params or {})
+
+    # Seeding helpers
+    def load(self, table, rows: List[dict]):
+        """Bulk load rows (with ids already assigned) without paying latency"""
+        with self._lock:
+            self.tables.setdefault(table, []).extend(rows)
+            top = max((row.get('id') or 0 for row in self.tables[table]), default=0)
+            self.next_id[table] = max(self.next_id.get(table, 1), top + 1)
+            self._invalidate(table)
+
+    def rows(self, table) -> List[dict]:
+        return self.tables.setdefault(table, [])
+
+    # Query engine
+    def _invalidate(self, table):
+        for key in [key for key in self._indexes if key[0] == table]:
+            del self._indexes[key]
+
+    def _index(self, table, column):
+        key = (table, column)
+        if key not in self._indexes:
+            index = {}
+            for row in self.rows(table):
+                index.setdefault(row.get(column), []).append(row)
+            self._indexes[key] = index
+        return self._indexes[key]
+
+    def _match(self, row, column, op, value):
+        current = row.get(column)
+        if op == "eq":
+            return current == value
+        if op == "neq":
+            return current != value
+        if op == "is":
+            return current is value if value is None else current == value
+        if op == "in":
+            return current in value
+        if current is None:
+            return False
+        if op == "gt":
+            return current > value
+        if op == "gte":
+            return current >= value
+        if op == "lt":
+            return current < value
+        return current <= value
+
+    def _candidates(self, query) -> List[dict]:
+     # Equality on any column is served from a lazily built hash index
+        for column, op, value in query.filters:
+            if op == "eq":
+                return self._index(query.table, column).get(value, [])
+        return self.rows(query.table)
+
+    def _filtered(self, query) -> List[dict]:
+        return [
+            row for row in self._candidates(query)
+            if all(self._match(row, column, op, value) for column, op, value in query.filters)
+        ]
+
+    def _project(self, row, columns):
+        columns = columns.strip()
+        embeds = _EMBED.findall(columns)
+        plain = [c.strip() for c in _EMBED.sub("", columns).split(",") if c.strip()]
+
+        if "*" in plain:
+            result = dict(row)
+        else:
+            result = {column: row.get(column) for column in plain}
+
+     # Foreign tables are embedded through <singular>_id, e.g. tasks(...) via task_id
+        for relation, relation_columns in embeds:
+            foreign_key = relation.rstrip("s") + "_id"
+            matches = self._index(relation, "id").get(row.get(foreign_key), [])
+            result[relation] = self._project(matches[0], relation_columns) if matches else None
+
+        return result
+
+    def _insert(self, table, payload) -> List[dict]:
+        inserted = []
+        for item in payload if isinstance(payload, list) else [payload]:
+            row = DEFAULTS[table]() if table in DEFAULTS else {}
+            row.update(deepcopy(item))
+            if row.get('id') is None:
+                row['id'] = self.next_id.get(table, 1)
+            self.next_id[table] = max(self.next_id.get(table, 1), row['id'] + 1)
+            self.rows(table).append(row)
+            inserted.append(dict(row))
+        return inserted
+
+    def _check_references(self, table, removed: List[dict]):
+        """Raise like Postgres (23503) when rows of another table still point at a row being deleted"""
+        ids = {row.get('id') for row in removed}
+        doomed = {id(row) for row in removed}
+        for child, keys in FOREIGN_KEYS.items():
+            for column, parent in keys:
+                if parent != table:
+                    continue
+                for row in self.rows(child):
+                    if row.get(column) in ids and id(row) not in doomed:
+                        raise APIError({
+                            "code": "23503",
+                            "message": f'update or delete on table "{table}" violates foreign key constraint '
+                                       f'"{child}_{column}_fkey" on table "{child}"',
+                            "details": f"Key (id)=({row[column]}) is still referenced from table \"{child}\".",
+                            "hint": None,
+                        })
+
+    def _execute(self, query) -> FakeResponse:
+        if self.latency or self.jitter:
+            time.sleep(self.latency + self._random.uniform(0, self.jitter))
+
+        with self._lock:
+            self.calls += 1
+
+            if query.action == "select":
+                rows = self._filtered(query)
+                for column, desc in reversed(query.ordering):
+                    rows = sorted(rows, key=lambda r: (r.get(column) is None, r.get(column)), reverse=desc)
+                if query.window:
+                    rows = rows[query.window[0]:query.window[1]]
+                rows = rows[:MAX_ROWS]
+                return FakeResponse([self._project(row, query.columns) for row in rows])
+
+            self._invalidate(query.table)
+
+            if query.action == "insert":
+                return FakeResponse(self._insert(query.table, query.payload))
+
+            if query.action == "update":
+                rows = self._filtered(query)
+                for row in rows:
+                    row.update(deepcopy(query.payload))
+                    if query.table == "tasks":
+                        row['updated_at'] = _now()
+                return FakeResponse([dict(row) for row in rows])
+
+            if query.action == "delete":
+                doomed = {id(row) for row in self._filtered(query)}
+                self._check_references(query.table, [row for row in self.rows(query.table) if id(row) in doomed])
+                kept, removed = [], []
+                for row in self.rows(query.table):
+                    (removed if id(row) in doomed else kept).append(row)
+                self.tables[query.table] = kept
+                return FakeResponse(removed)
+
+         # upsert: update rows matching the conflict columns, insert the rest
+            keys = [c.strip() for c in (query.on_conflict or "id").split(",")]
+            by_key = {tuple(row.get(k) for k in keys): row for row in self.rows(query.table)}
+            result = []
+            for item in query.payload if isinstance(query.payload, list) else [query.payload]:
+                existing = by_key.get(tuple(item.get(k) for k in keys))
+                if existing is not None:
+                    existing.update(deepcopy(item))
+                    result.append(dict(existing))
+                else:
+                    inserted = self._insert(query.table, item)
+                    by_key[tuple(item.get(k) for k in keys)] = self.rows(query.table)[-1]
+                    result.extend(inserted)
+            return FakeResponse(result)
+
+    def _rpc(self, name, params) -> FakeResponse:
+        if self.latency or self.jitter:
+            time.sleep(self.latency + self._random.uniform(0, self.jitter))
+
+        with self._lock:
+            self.calls += 1
+
+            if name == "increment_rollups":
+                self._invalidate("daily_rollups")
+                by_key = {(row['day'], row['category'], row['tag_path']): row for row in self.rows("daily_rollups")}
+                for bucket in params["buckets"]:
+                    key = (bucket['day'], bucket['category'], bucket['tag_path'])
+                    row = by_key.get(key)
+                    if row is None:
+                        self._insert("daily_rollups", bucket)
+                        row = by_key[key] = self.rows("daily_rollups")[-1]
+                    else:
+                        for column in ("points", "completions", "late", "minutes"):
+                            row[column] += bucket[column]
+                 # A negative increment (a deleted task's completions) drops the buckets it empties
+                    if row["completions"] <= 0:
+                        self.rows("daily_rollups").remove(row)
+                        del by_key[key]
+                return FakeResponse(None)
+
+            if name == "advance_streak":
+                self._invalidate("task_streaks")
+                row = next((row for row in self.rows("task_streaks") if row['task_id'] == params["p_task_id"]), None)
+                if row is None:
+                    row = {"task_id": params["p_task_id"], "current_streak": 0, "longest_streak": 0}
+                    self.rows("task_streaks").append(row)
+                row["current_streak"] = 0 if params["p_late"] else row["current_streak"] + 1
+                row["longest_streak"] = max(row["longest_streak"], row["current_streak"])
+                row["last_day"] = params["p_day"]
+                return FakeResponse(None)
+
+            if name == "apply_tag_compaction":
+                self._apply_tag_compaction(params["plan"])
+                return FakeResponse(None)
+
+            raise APIError({"code": "PGRST202", "message": f"Could not find the function public.{name}",
+                            "details": None, "hint": None})
+
+    def _apply_tag_compaction(self, plan):
+        self._invalidate("task_tags")
+        self._invalidate("tags")
+        link_deletes = set(plan["link_deletes"])
+        self.tables["task_tags"] = [link for link in self.rows("task_tags") if link['id'] not in link_deletes]
+        links = {link['id']: link for link in self.rows("task_tags")}
+        tags = {tag['id']: tag for tag in self.rows("tags")}
+        for update in plan["link_updates"]:
+            if update['id'] in links:
+                links[update['id']]['tag_id'] = update['tag_id']
+        for update in plan["parent_updates"]:
+            if update['id'] in tags:
+                tags[update['id']]['parent_tag_id'] = update['parent_tag_id']
+
+        merged_into = {int(tag_id): survivor for tag_id, survivor in plan["merged_into"].items()}
+        for link in links.values():
+            link['tag_id'] = merged_into.get(link['tag_id'], link['tag_id'])
+        for tag in tags.values():
+            tag['parent_tag_id'] = merged_into.get(tag.get('parent_tag_id'), tag.get('parent_tag_id'))
+
+     # Bottom up, like the function's delete loop
+        doomed = set(plan["tag_deletes"])
+        while True:
+            linked = {link['tag_id'] for link in self.rows("task_tags")}
+            parents = {tag.get('parent_tag_id') for tag in self.rows("tags")}
+            gone = {tag['id'] for tag in self.rows("tags")
+                    if tag['id'] in doomed and tag['id'] not in linked and tag['id'] not in parents}
+            if not gone:
+                return
+            self.tables["tags"] = [tag for tag in self.rows("tags") if tag['id'] not in gone]
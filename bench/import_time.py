@@ -0,0 +1,85 @@
+"""
+Cold start report: how long a fresh process takes to import the app and answer its first requests
+
+    python -m bench.import_time            # top 15 packages by import time
+    python -m bench.import_time --top 30
+
+Runs in a clean subprocess with `python -X importtime`, so nothing already imported here skews it.
+"""
+import os, sys, json, argparse, subprocess
+
+# Runs inside the child: import the app, then time the first health check and first client build
+PROBE = """
+import json, time
+start = time.perf_counter()
+import main
+imported = time.perf_counter()
+from fastapi.testclient import TestClient
+client = TestClient(main.app)
+ping = time.perf_counter()
+client.head("/")
+first_byte = time.perf_counter()
+from utils import clients
+clients.get_supabase()
+built = time.perf_counter()
+print(json.dumps({
+    "import_main_ms": (imported - start) * 1000,
+    "first_head_ms": (first_byte - ping) * 1000,
+    "supabase_client_ms": (built - first_byte) * 1000
+}))
+"""
+
+
+def parse_importtime(stderr: str):
+    """Turn `-X importtime` output into (module, self_us, cumulative_us) rows"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line.split(":", 1)[1].split("|")
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def by_package(rows):
+    """Total self import time per top-level package"""
+    totals = {}
+    for name, self_us, _ in rows:
+        package = name.split(".")[0]
+        totals[package] = totals.get(package, 0) + self_us
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure cold start import cost of main.py")
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args(argv)
+
+    env = dict(os.environ)
+    env.setdefault("SUPABASE_URL", "http://localhost:54321")
+    env.setdefault("SUPABASE_KEY", "bench.bench.bench")
+
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE],
+        capture_output=True, text=True, env=env, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    )
+    if result.returncode != 0:
+        print(result.stderr[-2000:])
+        return result.returncode
+
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+    rows = parse_importtime(result.stderr)
+
+    print("=== Cold start ===")
+    for name, ms in timings.items():
+        print(f"{name:24} {ms:>9.1f} ms")
+
+    print(f"\n=== Top {args.top} packages by import time ===")
+    for package, self_us in by_package(rows)[:args.top]:
+        print(f"{package:40} {self_us / 1000:>9.1f} ms")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,229 @@
+"""
+Offline load generator for the API
+
+    python -m bench.run --profile ci --json bench.json
+    python -m bench.run --profile full --db-latency-ms 20 --llm-latency-ms 800 --concurrency 32
+    python -m bench.run --profile ci --baseline bench.json   # exit 1 on regressions
+    python -m bench.run --profile ci --replica /tmp/replica.sqlite3
+
+Every endpoint is driven concurrently against the in-memory Supabase / Anthropic / Gist
+stand-ins, first one endpoint at a time and then all of them mixed together.
+"""
+import sys, json, time, random, asyncio, argparse
+from typing import Callable, List, Optional
+import httpx
+from bench.app import install
+
+
+class Scenario:
+    def __init__(self, name: str, method: str, path: Callable, body: Optional[Callable] = None,
+                 limit: Optional[int] = None):
+        self.name = name
+        self.method = method
+        self.path = path
+        self.body = body
+        self.limit = limit
+
+
+def build_scenarios(db, rng: random.Random) -> List[Scenario]:
+    """Every endpoint with request builders that pick valid ids out of the seeded dataset"""
+    all_ids = [row['id'] for row in db.rows("tasks")]
+    doomed = all_ids[-len(all_ids) // 5:]  # DELETE only ever hits the newest fifth of the tasks
+    task_ids = all_ids[:-len(doomed)]
+    kept = set(task_ids)
+    completion_ids = [row['id'] for row in db.rows("task_completions") if row['task_id'] in kept]
+
+    def new_task(i):
+        return {
+            "title": f"benchmark task {i}",
+            "description": "generated by bench.run",
+            "category": rng.choice(['mental', 'physical', 'social', 'financial']),
+            "priority": rng.randint(1, 5)
+        }
+
+    return [
+        Scenario("GET /", "GET", lambda i: "/"),
+        Scenario("HEAD /", "HEAD", lambda i: "/"),
+        Scenario("GET /api/tasks", "GET", lambda i: "/api/tasks"),
+        Scenario("POST /api/tasks", "POST", lambda i: "/api/tasks", new_task),
+        Scenario("POST /api/tasks/bulk", "POST", lambda i: "/api/tasks/bulk",
+                 lambda i: [new_task(f"{i}-{row}") for row in range(50)], limit=5),
+        Scenario("PATCH /api/tasks/{id}", "PATCH", lambda i: f"/api/tasks/{rng.choice(task_ids)}",
+                 lambda i: {"priority": rng.randint(1, 5)}),
+        Scenario("PATCH /api/tasks/disable/{id}", "PATCH", lambda i: f"/api/tasks/disable/{rng.choice(task_ids)}",
+                 lambda i: {"quality": rng.randint(1, 5), "notes": "bench"}),
+        Scenario("DELETE /api/tasks/{id}", "DELETE", lambda i: f"/api/tasks/{doomed.pop()}"),
+        Scenario("GET /api/completed", "GET", lambda i: f"/api/completed?limit=50&offset={rng.randint(0, 500)}"),
+        Scenario("PATCH /api/completed/{id}", "PATCH", lambda i: f"/api/completed/{rng.choice(completion_ids)}",
+                 lambda i: {"notes": "edited by bench"}),
+        Scenario("POST /api/analytics/rebuild", "POST", lambda i: "/api/analytics/rebuild", limit=2),
+        Scenario("GET /api/analytics/daily", "GET", lambda i: "/api/analytics/daily"),
+        Scenario("GET /api/analytics/late-ratio", "GET", lambda i: "/api/analytics/late-ratio"),
+        Scenario("GET /api/analytics/streaks", "GET", lambda i: "/api/analytics/streaks"),
+        Scenario("GET /api/skill-tree", "GET", lambda i: "/api/skill-tree", limit=3),
+        Scenario("GET /api/search", "GET", lambda i: f"/api/search?q={rng.choice(['read', 'med', 'plan budget', 'py'])}"),
+        Scenario("GET /metrics", "GET", lambda i: "/metrics"),
+    ]
+
+
+def external_calls(server_timing: str) -> int:
+    """Sum the call counts out of a Server-Timing header (supabase;dur=1.2;desc="4 calls", ...)"""
+    total = 0
+    for entry in server_timing.split(","):
+        if 'desc="' in entry:
+            total += int(entry.split('desc="', 1)[1].split()[0])
+    return total
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))]
+
+
+async def drive(client, scenarios: List[Scenario], requests: int, concurrency: int):
+    """Fire requests round robin over the scenarios with at most `concurrency` in flight"""
+    samples = {scenario.name: {"latency": [], "calls": [], "errors": 0} for scenario in scenarios}
+    jobs = []
+    for i in range(requests):
+        for scenario in scenarios:
+            if scenario.limit is None or i < scenario.limit:
+                jobs.append((i, scenario))
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i, scenario):
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                body = scenario.body(i) if scenario.body else None
+                response = await client.request(scenario.method, scenario.path(i), json=body)
+                ok = response.status_code < 400
+                calls = external_calls(response.headers.get("server-timing", ""))
+            except Exception:
+                ok, calls = False, 0
+            sample = samples[scenario.name]
+            sample["latency"].append(time.perf_counter() - start)
+            sample["calls"].append(calls)
+            sample["errors"] += 0 if ok else 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i, scenario) for i, scenario in jobs))
+    return samples, time.perf_counter() - start
+
+
+def summarize(samples, elapsed) -> dict:
+    report = {}
+    for name, sample in samples.items():
+        count = len(sample["latency"])
+        if not count:
+            continue
+        report[name] = {
+            "requests": count,
+            "errors": sample["errors"],
+            "p50_ms": round(percentile(sample["latency"], 50) * 1000, 2),
+            "p99_ms": round(percentile(sample["latency"], 99) * 1000, 2),
+            "throughput_rps": round(count / elapsed, 1) if elapsed else 0.0,
+            "calls_per_request": round(sum(sample["calls"]) / count, 2)
+        }
+    total = sum(len(sample["latency"]) for sample in samples.values())
+    report["_total"] = {"requests": total, "elapsed_s": round(elapsed, 3),
+                        "throughput_rps": round(total / elapsed, 1) if elapsed else 0.0}
+    return report
+
+
+def print_report(title, report):
+    print(f"\n=== {title} ===")
+    print(f"{'endpoint':36} {'n':>6} {'err':>4} {'p50 ms':>9} {'p99 ms':>9} {'req/s':>8} {'calls/req':>10}")
+    for name, row in report.items():
+        if name.startswith("_"):
+            continue
+        print(f"{name:36} {row['requests']:>6} {row['errors']:>4} {row['p50_ms']:>9} {row['p99_ms']:>9} "
+              f"{row['throughput_rps']:>8} {row['calls_per_request']:>10}")
+    total = report.get("_total")
+    if not total:
+        return
+    print(f"{'total':36} {total['requests']:>6} {'':>4} {'':>9} {'':>9} {total['throughput_rps']:>8}  ({total['elapsed_s']}s)")
+
+
+def regressions(current: dict, baseline: dict, tolerance: float, latency: bool = True) -> List[str]:
+    """Endpoints whose external calls per request (or p99, unless latency=False) grew past the tolerance"""
+    found = []
+    for phase, rows in baseline.get("phases", {}).items():
+        for name, old in rows.items():
+            new = current["phases"].get(phase, {}).get(name)
+            if name.startswith("_") or not new:
+                continue
+            if new["calls_per_request"] > max(old["calls_per_request"] * 1.05, old["calls_per_request"] + 0.5):
+                found.append(f"[{phase}] {name}: calls/request {old['calls_per_request']} -> {new['calls_per_request']}")
+            if latency and old["p99_ms"] >= 1 and new["p99_ms"] > old["p99_ms"] * (1 + tolerance):
+                found.append(f"[{phase}] {name}: p99 {old['p99_ms']}ms -> {new['p99_ms']}ms")
+    return found
+
+
+async def main(args):
+    app, db, gist = install(
+        profile=args.profile,
+        db_latency=args.db_latency_ms / 1000,
+        db_jitter=args.db_jitter_ms / 1000,
+        llm_latency=args.llm_latency_ms / 1000,
+        gist_latency=args.gist_latency_ms / 1000,
+        replica_path=args.replica
+    )
+    rng = random.Random(args.seed)
+    scenarios = build_scenarios(db, rng)
+    results = {"profile": args.profile, "phases": {}}
+
+    transport = httpx.ASGITransport(app=app)
+ # Admin endpoints (the rollup rebuild) need basic auth; the others ignore it
+    auth = ("your_username", "your_password")
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None, auth=auth) as client:
+     # One endpoint at a time: clean per-endpoint latency and fan-out
+        isolated = {}
+        for scenario in scenarios:
+            samples, elapsed = await drive(client, [scenario], args.requests, args.concurrency)
+            isolated.update({k: v for k, v in summarize(samples, elapsed).items() if not k.startswith("_")})
+        results["phases"]["isolated"] = isolated
+        print_report("isolated", isolated)
+
+     # Every endpoint at once
+        samples, elapsed = await drive(client, scenarios, args.requests, args.concurrency)
+        results["phases"]["mixed"] = summarize(samples, elapsed)
+        print_report("mixed", results["phases"]["mixed"])
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            found = regressions(results, json.load(f), args.tolerance, latency=args.check == "all")
+        for line in found:
+            print(f"[REGRESSION] - {line}")
+        return 1 if found else 0
+
+    return 0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmark of the tasks API")
+    parser.add_argument("--profile", choices=["ci", "full"], default="ci")
+    parser.add_argument("--requests", type=int, default=50, help="requests per endpoint per phase")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--db-latency-ms", type=float, default=0.0)
+    parser.add_argument("--db-jitter-ms", type=float, default=0.0)
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0)
+    parser.add_argument("--gist-latency-ms", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--replica", metavar="PATH", help="serve reads from a SQLite read replica at this (fresh) path")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--baseline", help="compare against a previous --json file and exit 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="allowed relative p99 growth vs the baseline")
+    parser.add_argument("--check", choices=["all", "calls"], default="all",
+                        help="compare latency and calls, or only calls (stable across machines)")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(parse_args())))
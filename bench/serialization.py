@@ -0,0 +1,77 @@
+"""
+Per-row CPU cost of list responses: FastAPI's response_model path vs the fast path in utils/serialization.py
+
+    python -m bench.serialization --rows 5000
+"""
+import sys, json, time, random, argparse
+from datetime import datetime, timedelta, timezone
+from typing import List
+from pydantic import TypeAdapter
+from utils.data import CompletionResponse
+from utils.serialization import dumps, trusted, COMPLETION_LIST
+
+
+def completion_rows(count: int, seed: int = 1) -> List[dict]:
+    """Rows shaped exactly like /api/completed returns them"""
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc)
+    return [{
+        "id": i,
+        "task_id": rng.randint(1, 10000),
+        "task_title": f"task number {rng.randint(1, 10000)}",
+        "task_category": rng.choice(['mental', 'physical', 'social', 'financial']),
+        "completed_at": (now - timedelta(minutes=rng.randint(0, 500000))).isoformat(),
+        "notes": "some notes about how it went " * rng.randint(0, 3),
+        "was_late": rng.random() < 0.25,
+        "time_spent_minutes": rng.randint(5, 240),
+        "points": rng.randint(-50, 60)
+    } for i in range(count)]
+
+
+def response_model_path(rows):
+    """What FastAPI does for response_model=List[CompletionResponse]: validate, serialize, json.dumps"""
+    adapter = TypeAdapter(List[CompletionResponse])
+    validated = adapter.validate_python(rows)
+    return json.dumps(adapter.dump_python(validated, mode="json"), ensure_ascii=False,
+                      allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+def prebuilt_adapter_path(rows):
+    """Validated, but with the adapter built once and serialized straight to JSON bytes"""
+    return COMPLETION_LIST.dump_json(COMPLETION_LIST.validate_python(rows))
+
+
+def fast_path(rows):
+    """Trusted rows encoded once (orjson when installed)"""
+    return dumps(trusted(rows, COMPLETION_LIST))
+
+
+def measure(func, rows, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(rows)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serialization cost per row")
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=7)
+    args = parser.parse_args(argv)
+
+    rows = completion_rows(args.rows)
+    print(f"=== {args.rows} rows, best of {args.repeat} ===")
+    baseline = None
+    for name, func in [("response_model", response_model_path),
+                       ("prebuilt TypeAdapter", prebuilt_adapter_path),
+                       ("trusted fast path", fast_path)]:
+        seconds = measure(func, rows, args.repeat)
+        baseline = baseline or seconds
+        print(f"{name:22} {seconds * 1000:>8.2f} ms  {seconds / args.rows * 1e6:>7.2f} us/row  {baseline / seconds:>5.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,16 @@
+"""
+The API over the bench stand-ins as a module-level ASGI app, for running under a real uvicorn:
+
+    BENCH_PROFILE=ci uvicorn bench.server:app --workers 4
+
+Every worker seeds its own (identical) in-memory dataset. Used by bench.workers.
+"""
+import os
+from bench.app import install
+
+app, db, gist = install(
+    profile=os.getenv("BENCH_PROFILE", "ci"),
+    db_latency=float(os.getenv("BENCH_DB_LATENCY_MS", "0")) / 1000,
+    db_jitter=float(os.getenv("BENCH_DB_JITTER_MS", "0")) / 1000,
+    gist_latency=float(os.getenv("BENCH_GIST_LATENCY_MS", "0")) / 1000
+)
@@ -0,0 +1,71 @@
+import json, time, copy, threading
+from types import SimpleNamespace
+
+# Stand-ins for the Anthropic SDK and the GitHub Gist API with configurable latency
+
+
+class StubAnthropic:
+    """Drop-in for anthropic.Anthropic: messages.create() returns a deterministic tag path list"""
+
+    latency = 0.0
+    calls = 0
+
+    def __init__(self, api_key=None, **kwargs):
+        self.messages = SimpleNamespace(create=self._create)
+
+    def _create(self, model=None, max_tokens=None, messages=None, **kwargs):
+        time.sleep(StubAnthropic.latency)
+        StubAnthropic.calls += 1
+
+        prompt = messages[0]["content"] if messages else ""
+        title = prompt.split('Task: "', 1)[-1].split('"', 1)[0]
+        words = [word.capitalize() for word in title.split()[:3]] or ["General"]
+        paths = ["Benchmark/" + "/".join(words)]
+
+        return SimpleNamespace(content=[SimpleNamespace(text=json.dumps(paths))])
+
+
+class StubGist:
+    """In-memory points.json with get_points/save_points matching scripts.game_tracker"""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.calls = 0
+        self._lock = threading.Lock()
+        self.data = {
+            "total": 0,
+            "categories": {'mental': 0, 'physical': 0, 'social': 0, 'financial': 0},
+            "last_deductions": {},
+            "history": [],
+            "tag_points": {}
+        }
+
+    def get_points(self):
+        time.sleep(self.latency)
+        with self._lock:
+            self.calls += 1
+            return copy.deepcopy(self.data)
+
+    def save_points(self, data):
+        time.sleep(self.latency)
+        with self._lock:
+            self.calls += 1
+            self.data = copy.deepcopy(data)
+
+
+def gist_app(stub: StubGist):
+    """The GitHub Gist REST endpoints manager.py uses (GET / PATCH /gists/{id}) over a StubGist"""
+    from fastapi import FastAPI, Body
+
+    app = FastAPI()
+
+    @app.get("/gists/{gist_id}")
+    def get_gist(gist_id: str):
+        return {"id": gist_id, "files": {"points.json": {"content": json.dumps(stub.get_points())}}}
+
+    @app.patch("/gists/{gist_id}")
+    def patch_gist(gist_id: str, payload: dict = Body(...)):
+        stub.save_points(json.loads(payload["files"]["points.json"]["content"]))
+        return {"id": gist_id}
+
+    return app
@@ -0,0 +1,117 @@
+"""
+Worker scaling: throughput of a read-heavy mix under a real uvicorn with 1, 2, 4, ... workers
+
+    python -m bench.workers --workers 1 2 4 --db-latency-ms 20
+    python -m bench.workers --workers 1 4 --json workers.json
+
+Each worker count gets a fresh uvicorn (bench.server:app) and a fresh shared cache. One in
+`--write-every` requests is a PATCH, so cache invalidations between workers are part of the mix.
+"""
+import os, sys, json, time, socket, random, asyncio, argparse, tempfile, subprocess
+from typing import List
+import httpx
+from bench.run import Scenario, drive, summarize, print_report
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(workers: int, port: int, args) -> subprocess.Popen:
+    env = dict(
+        os.environ,
+        WEB_CONCURRENCY=str(workers),
+        CACHE_PATH=os.path.join(tempfile.mkdtemp(prefix="bench-cache-"), "cache.sqlite3"),
+        BENCH_PROFILE=args.profile,
+        BENCH_DB_LATENCY_MS=str(args.db_latency_ms),
+        BENCH_GIST_LATENCY_MS=str(args.gist_latency_ms),
+        SEARCH_INDEX="0"
+    )
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "bench.server:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        env=env, stdout=subprocess.DEVNULL
+    )
+
+
+async def wait_ready(client, timeout: float = 120.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if (await client.head("/")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.25)
+    raise RuntimeError("uvicorn did not come up")
+
+
+def build_scenarios(task_ids: List[int], rng: random.Random) -> List[Scenario]:
+    return [
+        Scenario("GET /api/tasks", "GET", lambda i: "/api/tasks"),
+        Scenario("GET /api/completed", "GET", lambda i: f"/api/completed?limit=50&offset={rng.choice([0, 50, 100])}"),
+        Scenario("GET /api/skill-tree", "GET", lambda i: "/api/skill-tree"),
+        Scenario("PATCH /api/tasks/{id}", "PATCH", lambda i: f"/api/tasks/{rng.choice(task_ids)}",
+                 lambda i: {"priority": rng.randint(1, 5)}),
+    ]
+
+
+async def measure(workers: int, args) -> dict:
+    port = free_port()
+    server = start_server(workers, port, args)
+    try:
+        limits = httpx.Limits(max_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=None, limits=limits) as client:
+            await wait_ready(client)
+         # Let every worker finish importing and seeding before timing anything
+            await asyncio.sleep(args.settle)
+            task_ids = [task['id'] for task in (await client.get("/api/tasks")).json()]
+
+            rng = random.Random(args.seed)
+            scenarios = build_scenarios(task_ids, rng)
+            scenarios[-1].limit = args.requests // args.write_every
+            samples, elapsed = await drive(client, scenarios, args.requests, args.concurrency)
+            return summarize(samples, elapsed)
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+async def main(args):
+    results = {"profile": args.profile, "db_latency_ms": args.db_latency_ms, "workers": {}}
+    for workers in args.workers:
+        report = await measure(workers, args)
+        results["workers"][str(workers)] = report
+        print_report(f"{workers} worker(s)", report)
+
+    print("\n=== scaling ===")
+    base = results["workers"][str(args.workers[0])]["_total"]["throughput_rps"]
+    for workers, report in results["workers"].items():
+        rps = report["_total"]["throughput_rps"]
+        print(f"{workers:>3} worker(s) {rps:>9} req/s  x{rps / base:.2f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Throughput of the tasks API per uvicorn worker count")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--profile", choices=["ci", "full"], default="ci")
+    parser.add_argument("--requests", type=int, default=200, help="requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--db-latency-ms", type=float, default=20.0)
+    parser.add_argument("--gist-latency-ms", type=float, default=100.0)
+    parser.add_argument("--write-every", type=int, default=10, help="one PATCH per this many requests of each read")
+    parser.add_argument("--settle", type=float, default=3.0, help="seconds to wait after the first worker answers")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", help="write the results to this file")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(parse_args())))
@@ -1,45 +1,71 @@
 # main.py
-import os, re
-from fastapi import FastAPI, HTTPException, Depends
-from fastapi.responses import JSONResponse
+import os, re, time, asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Request, Header, BackgroundTasks, Query
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from typing import List, Optional
+from typing import Dict, List, Optional
 from pydantic import BaseModel
-from datetime import datetime, timedelta, timezone
+from datetime import datetime, date, timedelta, timezone
 import zoneinfo
-from supabase import Client, create_client
 from pathlib import Path
 from dotenv import load_dotenv
+from utils import clients
+from utils.clients import get_supabase, select_all
 from utils.auth import verify_credentials
-from utils.data import TaskCreate, TaskResponse, TaskUpdate, CompletionData, CompletionResponse, CompletionUpdate
-from utils.tags import build_hierarchy_string, ensure_tag_exists, auto_tag_task, get_tag_by_id, get_tag_path
-from scripts.game_tracker import get_points, save_points, calculate_points
-from anthropic import Anthropic
-
-# Set up the FastAPI backend. Use uvicorn as your web server (preferably)
-app = FastAPI()
-
-# Make the connection to Supabase instance
-supabase: Client = create_client(
-    os.getenv("SUPABASE_URL"),
-    os.getenv("SUPABASE_KEY")
-)
-
-# CORS for your frontend
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["https://sbpatel.dev", "http://localhost:3000"],
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+from utils.data import TaskCreate, TaskResponse, TaskUpdate, CompletionData, CompletionResponse, CompletionUpdate, DailyRollup, LateRatio, TaskStreak, BulkRowStatus, BulkImportResponse
+from utils.tags import build_hierarchy_string, ensure_tag_exists, auto_tag_task, get_tag_by_id, tag_paths_by_id
+from utils.analytics import record_completion, remove_completions, rebuild_rollups, query_rollups, late_ratios, get_streaks, tag_paths_for
+from utils.metrics import instrumented, increment, metrics_middleware, render_prometheus
+from utils.serialization import json_response, trusted, TASK_LIST, COMPLETION_LIST
+from utils.concurrency import SingleFlight, limiter_from_env
+from utils.profiling import profiles, profiling_middleware, collapsed, to_thread, enabled as profiling_enabled
+from utils.events import broker, event_stream
+from utils.search import index as search_index
+from utils.replica import replica, SYNC_SECONDS as REPLICA_SYNC_SECONDS
+from utils.compaction import compact_tags, SIMILARITY as TAG_SIMILARITY, MIN_SIMILARITY as TAG_MIN_SIMILARITY
+from utils.bulk import task_record, read_chunks, validate_chunk
+from utils.idempotency import store as idempotency, fingerprint, mark_written
+from utils.cache import cache, WORKERS, POLL_SECONDS as CACHE_POLL_SECONDS
+
+# Endpoints are declared on a router and mounted by create_app() at the bottom of this file
+router = APIRouter()
+
+
+# Concurrent identical requests share one in-flight computation instead of each fanning out upstream
+flights = SingleFlight("api")
+points_flight = SingleFlight("gist")
+
+# Per-route concurrency limits on the computations behind them: excess work queues briefly,
+# then the request gets 503 + Retry-After
+tasks_limiter = limiter_from_env("tasks", 8)
+completed_limiter = limiter_from_env("completed", 8)
+skill_tree_limiter = limiter_from_env("skill-tree", 2)
+analytics_limiter = limiter_from_env("analytics", 1, default_timeout=1.0)
+auto_tag_limiter = limiter_from_env("auto-tag", 4, default_timeout=30.0)
+
+
+# Count/time the GitHub Gist round trips made by the points system
+@instrumented("gist")
+def _fetch_points():
+    return clients.get_gist().get_points()
+
+@clients.on_warm
+def get_points():
+    """Current points.json (shared by concurrent callers and cached for CACHE_TTL_SECONDS, so don't mutate it)"""
+    return cache.get("points", "points", lambda: points_flight.do_sync("points", _fetch_points))
+
+@instrumented("gist")
+def save_points(data):
+    return clients.get_gist().save_points(data)
 
 
 ######## Endpoint implementation for our lovely web server API ###########
-@app.get("/")
+@router.get("/")
 def read_root():
     return {"message": "Infinite Domain: Satyam's Call Center"}
 
-@app.head("/")
+@router.head("/")
 async def head_root():
     """
     Handles HEAD requests for the root path.
@@ -47,62 +73,218 @@ async def head_root():
     """
     return  # Returning nothing (or an empty string) is sufficient for HEAD (exquisite dome)
 
+@router.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """
+    Prometheus scrape endpoint: per-route latency and Supabase/Anthropic/Gist call counters
+    """
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+
+@router.get("/api/profiles", dependencies=[Depends(verify_credentials)])
+async def list_profiles():
+    """
+    Request profiles captured by this worker (PROFILE_TOKEN header or PROFILE_SAMPLE_RATE), newest first
+    """
+    return profiles.list()
+
+@router.get("/api/profiles/collapsed", dependencies=[Depends(verify_credentials)])
+async def get_merged_profile(route: Optional[str] = None):
+    """
+    Every stored profile (or those of one route template, e.g. /api/skill-tree) as one set of collapsed stacks
+    """
+    return PlainTextResponse(collapsed(profiles.merged(route)))
+
+@router.get("/api/profiles/{profile_id}", dependencies=[Depends(verify_credentials)])
+async def get_profile(profile_id: int):
+    """
+    One request profile as collapsed stacks (microseconds): feed it to flamegraph.pl, speedscope or inferno
+    """
+    profile = profiles.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found (evicted, or captured by another worker)")
+    return PlainTextResponse(collapsed(profile["stacks"]))
+
+
+def replica_headers():
+    """Tell clients how stale a replica-served response may be"""
+    return {"X-Replica-Lag": f"{replica.lag():.3f}"} if replica.ready else {}
+
+@clients.on_warm
+def load_active_tasks():
+    return cache.get("tasks", "active", fetch_active_tasks)
+
+def fetch_active_tasks():
+    if replica.ready:
+        return replica.active_tasks()
+    return select_all('tasks', where=lambda query: query.eq('is_active', True))
 
-@app.get("/api/tasks", response_model=List[TaskResponse])
-async def get_active_tasks():
+@router.get("/api/tasks", response_model=List[TaskResponse])
+async def get_active_tasks(request: Request):
     """
         Retrieve all active tasks
 
         :request: NONE
         :response: A list of TaskResponse objects
     """
-    response = supabase.table('tasks').select("*").eq('is_active', True).execute()
-    return JSONResponse(
-        content=response.data,
-        media_type="application/json",
-        headers={"Content-Type": "application/json; charset=utf-8"}
-    )
+    tasks = await flights.do("active_tasks", tasks_limiter.run, load_active_tasks)
+    return json_response(trusted(tasks, TASK_LIST), request, headers=replica_headers())
 
-@app.post("/api/tasks", response_model=TaskResponse)
-async def create_task(task: TaskCreate):
+@router.post("/api/tasks", response_model=TaskResponse)
+async def create_task(task: TaskCreate, request: Request, idempotency_key: Optional[str] = Header(None)):
     """
         Create a new task using the TaskCreate data definition in /utils/data.py
+        (send an Idempotency-Key header to make retries safe)
 
         :request: A TaskCreate object
         :response: A TaskResponse object
     """
+    return await idempotency.run(idempotency_key, fingerprint(request, await request.body()), insert_task, task)
+
+async def insert_task(task: TaskCreate):
     try:
-        response = supabase.table('tasks').insert({
-            "title": task.title,
-            "description": task.description,
-            "category": task.category,
-            "priority": task.priority,
-            "due_date": task.due_date.isoformat() if task.due_date else None,
-            "is_recurring": task.is_recurring,
-            "recurrence_pattern": task.recurrence_pattern
-        }).execute()
+        response = await to_thread(get_supabase().table('tasks').insert(task_record(task)).execute)
+        mark_written()
 
      # Retrieve task ID to place within task_tags table    
         task_id = response.data[0]['id']
 
-     # Auto-tag with AI
-        tags = await auto_tag_task(response.data[0])
+     # Auto-tag with AI in a worker thread (identical concurrent tasks share one LLM call, and LLM calls are capped)
+        created = response.data[0]
+        tags = await flights.do(
+            ("auto_tag", created['title'], created.get('description'), created['category']),
+            auto_tag_limiter.run, auto_tag_task, created
+        )
 
         print("\nThe list of leaf-node tag IDs:", tags)
         
      # Insert task-tag relationships
-        for tag_id in tags:
-            supabase.table('task_tags').insert({
-                'task_id': task_id,
-                'tag_id': tag_id
-            }).execute()
+        links = []
+        if tags:
+            batch = get_supabase().table('task_tags').insert([{'task_id': task_id, 'tag_id': tag_id} for tag_id in tags])
+            links = (await to_thread(batch.execute)).data
+
+        replica.apply('tasks', [created])
+        replica.apply('task_tags', links)
+        cache.invalidate("tasks", "skill_tree")
+
+     # Keep the search index current (writes made during its bulk load are replayed once it finishes)
+        if search_index.tracking:
+            search_index.add_task(created, await to_thread(tag_paths_for, tags, created['category']))
 
+        broker.publish("task.created", created)
         return response.data[0]
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
-@app.patch("/api/tasks/{task_id}", response_model=TaskResponse)
+@router.post("/api/tasks/bulk", response_model=BulkImportResponse)
+async def bulk_create_tasks(request: Request, background_tasks: BackgroundTasks, auto_tag: bool = True,
+                            idempotency_key: Optional[str] = Header(None)):
+    """
+        Import many tasks at once from a JSON array of TaskCreate objects, or NDJSON (one per line,
+        Content-Type: application/x-ndjson) which is validated and inserted chunk by chunk as it streams in.
+        An Idempotency-Key here is bound to the path only, so that the body can still be streamed.
+
+        :request: A list of TaskCreate objects
+        :response: A BulkImportResponse with the status of every row; auto-tagging runs after the response
+    """
+    return await idempotency.run(idempotency_key, fingerprint(request), import_tasks, request, background_tasks, auto_tag)
+
+async def import_tasks(request: Request, background_tasks: BackgroundTasks, auto_tag: bool):
+    start = time.perf_counter()
+    statuses: List[BulkRowStatus] = []
+    created = []
+
+    async for chunk in read_chunks(request):
+        valid, invalid = validate_chunk(chunk)
+        statuses += invalid
+        if not valid:
+            continue
+
+     # One multi-row insert per chunk (rows come back in insertion order)
+        try:
+            batch = get_supabase().table('tasks').insert([record for _, record in valid])
+            rows = (await to_thread(batch.execute)).data
+        except Exception as e:
+            statuses += [BulkRowStatus(index=index, status="failed", error=str(e)) for index, _ in valid]
+            continue
+        mark_written()
+
+        statuses += [BulkRowStatus(index=index, status="created", id=row['id']) for (index, _), row in zip(valid, rows)]
+        created += rows
+        replica.apply('tasks', rows)
+        if search_index.tracking:
+            for row in rows:
+                search_index.add_task(row)
+        for row in rows:
+            broker.publish("task.created", row)
+
+    if created:
+        cache.invalidate("tasks")
+        if auto_tag:
+            background_tasks.add_task(tag_imported_tasks, created)
+
+    elapsed = time.perf_counter() - start
+    statuses.sort(key=lambda status: status.index)
+    counts = {kind: sum(1 for status in statuses if status.status == kind) for kind in ("created", "invalid", "failed")}
+    for kind, count in counts.items():
+        increment("bulk_import_rows_total", count, status=kind)
+
+    return BulkImportResponse(
+        received=len(statuses),
+        **counts,
+        seconds=round(elapsed, 3),
+        rows_per_second=round(len(statuses) / elapsed, 1) if elapsed else 0.0,
+        tagging=("queued" if auto_tag else "skipped") if created else "none",
+        rows=statuses
+    )
+
+
+async def tag_imported_tasks(tasks: List[dict]):
+    """
+    Auto-tag a bulk import: LLM calls go out a limiter's worth at a time (so none of them waits long
+    enough to be shed), then every task_tags link is inserted in one batch
+    """
+    links, tag_ids_by_task = [], {}
+    width = auto_tag_limiter.limit
+    for i in range(0, len(tasks), width):
+        wave = tasks[i:i + width]
+        results = await asyncio.gather(*(
+            flights.do(("auto_tag", task['title'], task.get('description'), task['category']),
+                       auto_tag_limiter.run, auto_tag_task, task)
+            for task in wave
+        ), return_exceptions=True)
+
+        for task, tags in zip(wave, results):
+            if isinstance(tags, BaseException):
+                print(f"[ERROR] - Auto-tagging imported task {task['id']} failed: {str(tags)}")
+                continue
+            links += [{'task_id': task['id'], 'tag_id': tag_id} for tag_id in tags]
+            tag_ids_by_task[task['id']] = tags
+
+    await to_thread(save_imported_tags, tasks, links, tag_ids_by_task)
+
+def save_imported_tags(tasks: List[dict], links: List[dict], tag_ids_by_task: Dict[int, List[int]]):
+    try:
+        if links:
+            inserted = get_supabase().table('task_tags').insert(links).execute().data
+            replica.apply('task_tags', inserted)
+        cache.invalidate("tasks", "skill_tree")
+
+     # One tags read for the whole import, not one per task
+        if search_index.tracking and tag_ids_by_task:
+            paths = tag_paths_by_id(select_all('tags'))
+            for task in tasks:
+                if task['id'] in tag_ids_by_task:
+                    tag_paths = [paths[tag_id] for tag_id in tag_ids_by_task[task['id']] if tag_id in paths]
+                    search_index.add_task(task, tag_paths)
+    except Exception as e:
+        print(f"[ERROR] - Saving tags of {len(tasks)} imported tasks failed: {str(e)}")
+
+
+@router.patch("/api/tasks/{task_id}", response_model=TaskResponse)
 async def update_task(task_id: int, task: TaskUpdate):
     """
         Update fields of a task based on the TaskUpdate data definition in /utils/data.py
@@ -134,20 +316,26 @@ async def update_task(task_id: int, task: TaskUpdate):
      # DISABLED SINCE THERE IS A TRIGGER IN THE DATABASE WHICH AUTOMATICALLY UPDATES THE 'updated_at' FIELD ON UPDATE QUERIES
         #update_data["updated_at"] = datetime.now().isoformat()
         
-        response = supabase.table('tasks').update(update_data).eq('id', task_id).execute()
+        response = get_supabase().table('tasks').update(update_data).eq('id', task_id).execute()
         
         if not response.data:
             raise HTTPException(status_code=404, detail="Task not found")
-            
+
+        replica.apply('tasks', response.data)
+        cache.invalidate("tasks")
+        search_index.update_task(task_id, update_data)
+        broker.publish("task.updated", {"id": task_id, **update_data})
         return response.data[0]
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
-@app.patch("/api/tasks/disable/{task_id}")
-async def disable_task(task_id: int, completion_data: Optional[CompletionData] = None):
+@router.patch("/api/tasks/disable/{task_id}")
+async def disable_task(task_id: int, request: Request, completion_data: Optional[CompletionData] = None,
+                       idempotency_key: Optional[str] = Header(None)):
     """
     Complete task - log completion and handle recurring tasks
+    (send an Idempotency-Key header so that a retry can't log the completion twice)
     
     Optional request body:
     {
@@ -155,9 +343,13 @@ async def disable_task(task_id: int, completion_data: Optional[CompletionData] =
         "notes": "string"
     }
     """
+    return await idempotency.run(idempotency_key, fingerprint(request, await request.body()),
+                                 complete_task, task_id, completion_data)
+
+async def complete_task(task_id: int, completion_data: Optional[CompletionData]):
     try:
      # Get the task first
-        task = supabase.table('tasks').select("*").eq('id', task_id).execute()
+        task = get_supabase().table('tasks').select("*").eq('id', task_id).execute()
         if not task.data:
             raise HTTPException(status_code=404, detail="Task not found")
         
@@ -190,7 +382,7 @@ async def disable_task(task_id: int, completion_data: Optional[CompletionData] =
             completion_record["time_spent_minutes"] = int(passed_time.total_seconds() // 60)
 
      # Get task with its tags
-        task_tags = supabase.table('task_tags').select(
+        task_tags = get_supabase().table('task_tags').select(
             "tag_id, tags(*)"
         ).eq('task_id', task_id).execute()
         
@@ -219,15 +411,31 @@ async def disable_task(task_id: int, completion_data: Optional[CompletionData] =
         completion_record["points"] = base_points
 
      # Insert the completed task into the task_completion table
-        supabase.table('task_completions').insert(completion_record).execute()
+        completion = get_supabase().table('task_completions').insert(completion_record).execute().data[0]
+        mark_written()
+        replica.apply('task_completions', [completion])
+        cache.invalidate("completions", "skill_tree")
+
+     # Fold the completion into the daily analytics rollups and the search index (never fail the completion over it)
+        try:
+            tag_ids = [task_tag['tag_id'] for task_tag in task_tags.data]
+            tag_paths = tag_paths_for(tag_ids, task_data['category'])
+            record_completion(task_data, completion_record, tag_paths)
+            search_index.add_completion(completion, task_data, tag_paths)
+        except Exception as e:
+            print(f"[ERROR] - Failed to update analytics rollups / search index: {str(e)}")
 
 ###### Set the task in the table to inactive / update due date if recurrent
 
      # Handle recurring vs non-recurring
         if not task_data['is_recurring']:
-            response = supabase.table('tasks').update({
+            response = get_supabase().table('tasks').update({
                 "is_active": False
             }).eq('id', task_id).execute()
+            replica.apply('tasks', response.data)
+            cache.invalidate("tasks")
+            search_index.update_task(task_id, {"is_active": False})
+            broker.publish("task.completed", {"id": task_id, "is_active": False, "points_earned": base_points})
             return {"message": f"Task completed! {base_points} points", "points_earned": base_points}
         
      # If recurring, calculate next due date (existing logic)
@@ -256,10 +464,13 @@ async def disable_task(task_id: int, completion_data: Optional[CompletionData] =
                 next_due = current_due + timedelta(weeks=1)
         
      # Update the due date
-        response = supabase.table('tasks').update({
+        response = get_supabase().table('tasks').update({
             "due_date": next_due.isoformat()
         }).eq('id', task_id).execute()
-        
+
+        replica.apply('tasks', response.data)
+        cache.invalidate("tasks")
+        broker.publish("task.completed", {"id": task_id, "due_date": next_due.isoformat(), "points_earned": base_points})
         return {
             "message": f"Recurring task completed! {base_points} points. Next due: {next_due.date()}", 
             "points_earned": base_points,
@@ -270,7 +481,7 @@ async def disable_task(task_id: int, completion_data: Optional[CompletionData] =
         raise HTTPException(status_code=400, detail=str(e))
     
 
-@app.delete("/api/tasks/{task_id}")
+@router.delete("/api/tasks/{task_id}")
 async def hard_delete_task(task_id: int):
     """
         Hard delete a task from the table entirely
@@ -280,91 +491,216 @@ async def hard_delete_task(task_id: int):
     """
     try:
      # Check if task exists
-        existing_task = supabase.table('tasks').select("*").eq('id', task_id).execute()
+        existing_task = get_supabase().table('tasks').select("*").eq('id', task_id).execute()
         if not existing_task.data:
             raise HTTPException(status_code=404, detail="Task not found")
 
+     # What the task's completions added to the rollups, to take back out once they are gone
+        completions = select_all('task_completions', "completed_at, points, was_late, time_spent_minutes",
+                                 where=lambda query: query.eq('task_id', task_id))
+        tag_ids = [link['tag_id'] for link in select_all('task_tags', "tag_id", where=lambda query: query.eq('task_id', task_id))]
+        tag_paths = tag_paths_for(tag_ids, existing_task.data[0]['category']) if completions else []
+
      # Delete dependent records first (optional)
-        supabase.table('notifications').delete().eq('task_id', task_id).execute()
-        supabase.table('task_completions').delete().eq('task_id', task_id).execute()
-        supabase.table('task_tags').delete().eq('task_id', task_id).execute()
+        get_supabase().table('notifications').delete().eq('task_id', task_id).execute()
+        get_supabase().table('task_completions').delete().eq('task_id', task_id).execute()
+        remove_completions(existing_task.data[0], completions, tag_paths)
+        get_supabase().table('task_tags').delete().eq('task_id', task_id).execute()
+        get_supabase().table('task_streaks').delete().eq('task_id', task_id).execute()
 
      # Finally, delete the task
-        supabase.table('tasks').delete().eq('id', task_id).execute()
+        get_supabase().table('tasks').delete().eq('id', task_id).execute()
 
+        replica.delete_task(task_id)
+        cache.invalidate("tasks", "completions", "skill_tree")
+        search_index.remove_task(task_id)
+        broker.publish("task.deleted", {"id": task_id})
         return {"message": "Task and all related records permanently deleted"}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
     
 
+@router.get("/api/stream")
+async def stream_task_changes(request: Request, last_event_id: Optional[str] = Header(None)):
+    """
+        Server-sent events stream of task changes (task.created / task.updated / task.completed / task.deleted)
+
+        :request: Optional Last-Event-ID header (or ?last_event_id=) to resume after a reconnect
+        :response: text/event-stream; a `resync` event means "re-fetch GET /api/tasks, then carry on"
+    """
+    subscriber = broker.subscribe(last_event_id or request.query_params.get("last_event_id"))
+    return StreamingResponse(
+        event_stream(broker, subscriber, request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.get("/api/search")
+async def search(q: str, category: Optional[str] = None, tag: Optional[str] = None,
+                 kind: Optional[str] = None, limit: int = 20):
+    """
+        Full-text search (BM25, prefix matching) over task titles/descriptions and completion notes
+
+        :request: q plus optional category, tag path (matches the tag and everything below it),
+                  kind ("task" / "completion") and limit
+        :response: The total number of matches and the top `limit` results, best first
+    """
+    if not search_index.ready:
+        await flights.do("search_index", search_index.load)
+
+    start = time.perf_counter()
+    total, results = search_index.search(q, category=category, tag=tag, kind=kind, limit=limit)
+    return {
+        "query": q,
+        "total": total,
+        "took_ms": round((time.perf_counter() - start) * 1000, 3),
+        "results": results
+    }
+
+
 ####################### /api/completed
 
-@app.get("/api/completed", response_model=List[CompletionResponse])
-async def get_completed_tasks(limit: int = 50, offset: int = 0):
+# Only the first pages of the default size are cached: any other limit/offset from the query string would be
+# one more full page kept in memory and in the shared file until the next invalidation
+COMPLETED_PAGE_SIZE = 50
+COMPLETED_CACHED_PAGES = 5
+
+@router.get("/api/completed", response_model=List[CompletionResponse])
+async def get_completed_tasks(request: Request, limit: int = COMPLETED_PAGE_SIZE, offset: int = 0):
     """Get completed tasks with task details"""
-    response = supabase.table('task_completions').select(
-        "*, tasks(title, category)"
+    completions = await flights.do(("completed", limit, offset), completed_limiter.run, load_completions, limit, offset)
+    return json_response(trusted(completions, COMPLETION_LIST), request, headers=replica_headers())
+
+def load_completions(limit, offset):
+    if limit != COMPLETED_PAGE_SIZE or offset % limit or offset >= limit * COMPLETED_CACHED_PAGES:
+        return fetch_completions(limit, offset)
+    return cache.get("completions", (limit, offset), lambda: fetch_completions(limit, offset))
+
+def fetch_completions(limit, offset):
+    if replica.ready:
+        return replica.completions(limit, offset)
+
+    response = get_supabase().table('task_completions').select(
+        "id, task_id, completed_at, notes, was_late, time_spent_minutes, points, tasks(title, category)"
     ).order('completed_at', desc=True).range(offset, offset + limit - 1).execute()
     
-    # Transform the response
-    completions = []
-    for item in response.data:
-        completions.append({
-            "id": item['id'],
-            "task_id": item['task_id'],
-            "task_title": item['tasks']['title'],
-            "task_category": item['tasks']['category'],
-            "completed_at": item['completed_at'],
-            "notes": item['notes'],
-            "was_late": item['was_late'],
-            "time_spent_minutes": item['time_spent_minutes'],
-            "points": item['points']
-        })
+    # Flatten the embedded task into the row (already the CompletionResponse shape, so no re-validation)
+    completions = [{
+        "id": item['id'],
+        "task_id": item['task_id'],
+        "task_title": item['tasks']['title'],
+        "task_category": item['tasks']['category'],
+        "completed_at": item['completed_at'],
+        "notes": item['notes'],
+        "was_late": item['was_late'],
+        "time_spent_minutes": item['time_spent_minutes'],
+        "points": item['points']
+    } for item in response.data]
     
     return completions
 
-@app.patch("/api/completed/{completion_id}")
+@router.patch("/api/completed/{completion_id}")
 async def update_completion_notes(completion_id: int, update: CompletionUpdate):
     """Update notes for a completed task"""
-    response = supabase.table('task_completions').update({
+    response = get_supabase().table('task_completions').update({
         "notes": update.notes
     }).eq('id', completion_id).execute()
     
     if not response.data:
         raise HTTPException(status_code=404, detail="Completion not found")
-    
+
+    replica.apply('task_completions', response.data)
+    cache.invalidate("completions")
+    search_index.update_completion(completion_id, update.notes)
     return {"message": "Notes updated"}
 
+######## TAG MAINTENANCE
+
+@router.post("/api/tags/compact", dependencies=[Depends(verify_credentials)])
+async def compact_tag_tree(dry_run: bool = True,
+                           threshold: float = Query(TAG_SIMILARITY, ge=TAG_MIN_SIMILARITY, le=1.0)):
+    """
+        Merge near-duplicate sibling tags ("Web Dev" / "Web Development"), re-point their task_tags
+        links and prune tags nothing links to. Only reports what it would do unless dry_run=false.
+
+        :response: Tag counts before / after plus every merge and prune
+    """
+    try:
+        report = await flights.do(("tag_compaction", dry_run, threshold), compact_tags, dry_run, threshold)
+        if dry_run or not (report["merged"] or report["pruned"]):
+            return report
+
+     # Everything derived from tag ids / paths: the replica, the skill tree, the search index and the rollups
+        if replica.ready:
+            await asyncio.to_thread(replica.reload, 'tags', 'task_tags')
+        cache.invalidate("tasks", "skill_tree")
+        if search_index.ready:
+            await flights.do("search_index", search_index.load)
+            if WORKERS > 1:
+                cache.publish("search.reload", None)
+        report["rollups"] = await flights.do("analytics_rebuild", rebuild_rollups)
+        return report
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 ######## SKILL TREE VISUALIZATION
 
-@app.get("/api/skill-tree")
-async def get_skill_tree():
-    """Get hierarchical skill tree with points"""
- # Get all tags
-    tags_response = supabase.table('tags').select("*").execute()
-    tags = tags_response.data
+@router.get("/api/skill-tree")
+async def get_skill_tree(request: Request):
+    """Get hierarchical skill tree with points (concurrent requests share one build)"""
+    tree = await flights.do("skill_tree", skill_tree_limiter.run, load_skill_tree)
+    return json_response(tree, request, headers=replica_headers())
+
+
+@clients.on_warm
+def load_skill_tree():
+    return cache.get("skill_tree", "tree", build_skill_tree)
+
+
+def skill_tree_inputs():
+    """
+    All tags, completions per tag id (a completion counts once for every tag of its task) and
+    the total number of completions, read from the replica when it is enabled
+    """
+    if replica.ready:
+        counts, total = replica.completion_counts()
+        return replica.tags(), counts, total
+
+ # Three (paged) reads aggregated in memory, instead of one task_tags query per completion
+    tags = select_all('tags')
+    completions = select_all('task_completions', "task_id")
+    links = select_all('task_tags', "task_id, tag_id")
+
+    tags_by_task = {}
+    for link in links:
+        tags_by_task.setdefault(link['task_id'], []).append(link['tag_id'])
+
+    counts = {}
+    for completion in completions:
+        for tag_id in tags_by_task.get(completion['task_id'], []):
+            counts[tag_id] = counts.get(tag_id, 0) + 1
+
+    return tags, counts, len(completions)
+
+
+def build_skill_tree():
+    """Build the hierarchical skill tree with points"""
+ # Get all tags and completion counts
+    tags, counts_by_tag, completed_total = skill_tree_inputs()
+    tag_paths = tag_paths_by_id(tags)
     
  # Get points data from GitHub Gist
     points_data = get_points()
     
- # Get completed task counts per tag
-  # First, get all completed tasks with their tags
+ # Completed task counts per tag path
     task_counts = {}
-    
-  # Get all task completions
-    completions = supabase.table('task_completions').select("task_id").execute()
-    
-    for completion in completions.data:
-     # Get tags for this completed task
-        task_tags = supabase.table('task_tags').select("tag_id").eq(
-            'task_id', completion['task_id']
-        ).execute()
-        
-     # Count completion for each tag
-        for task_tag in task_tags.data:
-            tag_id = task_tag['tag_id']
-            tag_path = get_tag_path(tag_id)
-            task_counts[tag_path] = task_counts.get(tag_path, 0) + 1
+    for tag_id, count in counts_by_tag.items():
+        if tag_id in tag_paths:
+            task_counts[tag_paths[tag_id]] = task_counts.get(tag_paths[tag_id], 0) + count
     
  # Build tree structure
     def build_tree():
@@ -372,7 +708,7 @@ async def get_skill_tree():
         root = {
             "name": "All Skills",
             "points": points_data.get('total', 0),
-            "completed_tasks": len(completions.data),
+            "completed_tasks": completed_total,
             "children": []
         }
         
@@ -401,7 +737,7 @@ async def get_skill_tree():
     
     def build_tag_node(tag, all_tags):
         """Recursively build tag nodes"""
-        tag_path = get_tag_path(tag['id'])
+        tag_path = tag_paths[tag['id']]
         
         node = {
             "name": tag['name'],
@@ -422,4 +758,142 @@ async def get_skill_tree():
         return node
     
     tree = build_tree()
-    return tree
\ No newline at end of file
+    return tree
+
+
+######## ANALYTICS (served from the daily_rollups buckets, never from raw task_completions; the paged reads run in a worker thread)
+
+@router.get("/api/analytics/daily", response_model=List[DailyRollup])
+async def get_daily_analytics(request: Request, start: Optional[date] = None, end: Optional[date] = None,
+                              category: Optional[str] = None, tag: Optional[str] = None):
+    """
+        Points, completions, late completions and minutes per category per day
+
+        :request: Optional start/end days, a category and a tag path (omit the tag for category totals)
+        :response: A list of DailyRollup objects, oldest day first
+    """
+    return json_response(await to_thread(query_rollups, start, end, category, tag if tag is not None else ""), request)
+
+@router.get("/api/analytics/late-ratio", response_model=List[LateRatio])
+async def get_late_ratio(start: Optional[date] = None, end: Optional[date] = None,
+                         category: Optional[str] = None):
+    """
+        Ratio of late completions per category and tag path ('' is the category as a whole)
+
+        :request: Optional start/end days and a category
+        :response: A list of LateRatio objects
+    """
+    return late_ratios(await to_thread(query_rollups, start, end, category, None))
+
+@router.get("/api/analytics/streaks", response_model=List[TaskStreak])
+async def get_task_streaks():
+    """
+        Current (consecutive on-time completions) and longest streak of every recurring task
+
+        :request: NONE
+        :response: A list of TaskStreak objects, longest current streak first
+    """
+    return await to_thread(get_streaks)
+
+@router.post("/api/analytics/rebuild", dependencies=[Depends(verify_credentials)])
+async def rebuild_analytics():
+    """
+        Rebuild every rollup bucket and streak from the raw task_completions history
+
+        :request: NONE
+        :response: How many completions were scanned and buckets/streaks written
+    """
+    try:
+        return await flights.do("analytics_rebuild", analytics_limiter.run, rebuild_rollups)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+
+######## App factory (uvicorn main:app)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Clients are built lazily on first use so the process starts serving as soon as possible.
+    With WARM_START=1 they (and any registered cache warmers) are built in the background instead.
+    """
+    if os.getenv("WARM_START"):
+        app.state.warmup = asyncio.create_task(asyncio.to_thread(clients.warm))
+
+ # Bulk build the search index in the background; /api/search waits on the same build if it isn't done yet
+    if os.getenv("SEARCH_INDEX", "1") != "0":
+        app.state.search_build = asyncio.create_task(flights.do("search_index", search_index.load))
+
+ # Keep the local read replica caught up (reads fall back to Supabase until the first sync lands)
+    if replica.enabled:
+        app.state.replica_sync = asyncio.create_task(sync_replica_forever())
+
+ # Multi-worker mode: relay task events and search index writes between workers
+    if WORKERS > 1:
+        broker.forward = cache.publish
+        search_index.forward = cache.publish
+        app.state.cache_poll = asyncio.create_task(poll_workers_forever())
+    yield
+
+
+async def sync_replica_forever():
+    while True:
+        try:
+            pulled = await asyncio.to_thread(replica.sync)
+            if any(pulled.values()):
+                print(f"[REPLICA] - Synced {pulled}")
+        except Exception as e:
+            print(f"[ERROR] - Replica sync failed: {str(e)}")
+        await asyncio.sleep(REPLICA_SYNC_SECONDS)
+
+
+async def poll_workers_forever():
+    while True:
+        try:
+            for kind, data in cache.poll():
+                if kind == "search":
+                    search_index.deliver(*data)
+                elif kind == "search.reload":
+                    resync_search_index()
+                else:
+                    broker.deliver(kind, data)
+        except Exception as e:
+            print(f"[ERROR] - Polling the other workers failed: {str(e)}")
+        await asyncio.sleep(CACHE_POLL_SECONDS)
+
+
+def resync_search_index():
+    """Another worker rewrote the tags (compaction): rebuild this worker's search index in the background"""
+    if search_index.ready:
+        asyncio.create_task(flights.do("search_index", search_index.load))
+
+
+def create_app() -> FastAPI:
+    """Build the FastAPI app: middleware + every endpoint on the router"""
+    app = FastAPI(lifespan=lifespan)
+
+ # CORS for your frontend
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["https://sbpatel.dev", "http://localhost:3000"],
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=["Server-Timing", "X-Profile-Id"],
+    )
+
+ # Opt-in request profiles (see /api/profiles): not installed at all unless PROFILE_TOKEN / PROFILE_SAMPLE_RATE is set
+    if profiling_enabled:
+        app.middleware("http")(profiling_middleware)
+
+ # Per-route latency histograms + external call counts (see /metrics)
+    app.middleware("http")(metrics_middleware)
+
+    app.include_router(router)
+    return app
+
+
+# Set up the FastAPI backend. Use uvicorn as your web server (preferably)
+app = create_app()
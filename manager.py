@@ -1,41 +1,123 @@
 import os
 import json
-import requests
+import time
+import random
+import asyncio
+import httpx
 import sys
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta, timezone
 import zoneinfo
 from pathlib import Path
-from scripts.game_tracker import get_points, save_points, penalize_overdue
+from scripts.game_tracker import gist_url, gist_headers, parse_points, points_payload, penalize_overdue
 
 # Configuration
-WEB_SERVER_API = "https://tasks-api-71v5.onrender.com"
+WEB_SERVER_API = os.getenv("TASKS_API_URL", "https://tasks-api-71v5.onrender.com")
 SENT_FILE = Path(__file__).parent.parent / "data" / "sent.json"
 EASTERN_TZ = zoneinfo.ZoneInfo("America/New_York")
 
+# Render can take well over a minute to wake the API up, so only the warm-up ping waits that long
+WARMUP_TIMEOUT = float(os.getenv("WARMUP_TIMEOUT", "100"))
+REQUEST_TIMEOUT = float(os.getenv("REQUEST_TIMEOUT", "20"))
+RETRIES = int(os.getenv("MANAGER_RETRIES", "3"))
+BACKOFF_SECONDS = float(os.getenv("MANAGER_BACKOFF", "0.5"))
+RETRY_STATUSES = {429, 500, 502, 503, 504}
 
-def get_tasks():
-    """Get active tasks from API with error handling"""
-    try:
-        print(f"Requesting tasks from: {WEB_SERVER_API}/api/tasks")
-        res = requests.get(f"{WEB_SERVER_API}/api/tasks", timeout=100)
-        print(f"API response status: {res.status_code}")
-        
-        # Check for successful response
-        if res.status_code != 200:
-            print(f"[ERROR] - API Error: Received status {res.status_code}")
-            print(f"Response content: {res.text[:200]}")  # First 200 characters
-            return None
-            
-        # Attempt to parse JSON
+
+class StageFailed(Exception):
+    pass
+
+
+class Report:
+    """Wall-clock time and outcome of every stage of a run"""
+
+    def __init__(self):
+        self.stages = []
+        self.started = time.perf_counter()
+
+    @asynccontextmanager
+    async def stage(self, name):
+        start = time.perf_counter()
+        entry = {"stage": name, "ok": True, "detail": ""}
         try:
-            return res.json()
-        except json.JSONDecodeError:
-            print(f"[ERROR] - JSON Decode Error. Response content: {res.text[:200]}")
-            return None
-            
-    except requests.exceptions.RequestException as e:
-        print(f"[ERROR] - Request failed: {str(e)}")
-        return None
+            yield entry
+        except Exception as e:
+            entry["ok"] = False
+            entry["detail"] = str(e)
+            print(f"[ERROR] - Stage '{name}' failed: {str(e)}")
+        finally:
+            entry["seconds"] = time.perf_counter() - start
+            self.stages.append(entry)
+
+    @property
+    def ok(self):
+        return all(entry["ok"] for entry in self.stages)
+
+    def print(self):
+        print("\n=== Stage report ===")
+        for entry in self.stages:
+            status = "ok" if entry["ok"] else "FAILED"
+            print(f"{entry['stage']:<16} {status:<7} {entry['seconds'] * 1000:>9.1f}ms  {entry['detail']}")
+        print(f"{'total':<16} {'ok' if self.ok else 'FAILED':<7} {(time.perf_counter() - self.started) * 1000:>9.1f}ms")
+
+
+async def request(client, method, url, retries=RETRIES, **kwargs):
+    """
+    Send a request, retrying transport errors and 429/5xx responses with jittered exponential backoff
+
+    :return response: The first successful response (raises StageFailed once retries run out)
+    """
+    for attempt in range(retries + 1):
+        try:
+            response = await client.request(method, url, **kwargs)
+            if response.status_code not in RETRY_STATUSES:
+                response.raise_for_status()
+                return response
+            error = f"{method} {url} returned {response.status_code}"
+            retry_after = response.headers.get("Retry-After", "")
+        except httpx.TransportError as e:
+            error = f"{method} {url} failed: {e.__class__.__name__} {str(e)}"
+            retry_after = ""
+        except httpx.HTTPStatusError as e:
+            raise StageFailed(f"{method} {url} returned {e.response.status_code}: {e.response.text[:200]}")
+
+        if attempt == retries:
+            raise StageFailed(f"{error} (after {retries + 1} attempts)")
+
+     # Full jitter, but never sooner than the server asked for
+        delay = random.uniform(0, BACKOFF_SECONDS * 2 ** attempt)
+        if retry_after.isdigit():
+            delay = max(delay, float(retry_after))
+        print(f"[RETRY] - {error}, retrying in {delay:.2f}s")
+        await asyncio.sleep(delay)
+
+
+async def warm_api(client):
+    """HEAD / until the API answers, waiting out a Render cold start"""
+    await request(client, "HEAD", f"{WEB_SERVER_API}/", timeout=WARMUP_TIMEOUT)
+
+
+async def get_tasks(client):
+    """Get active tasks from the (already warm) API"""
+    print(f"Requesting tasks from: {WEB_SERVER_API}/api/tasks")
+    res = await request(client, "GET", f"{WEB_SERVER_API}/api/tasks")
+    print(f"API response status: {res.status_code}")
+
+    try:
+        return res.json()
+    except json.JSONDecodeError:
+        raise StageFailed(f"JSON Decode Error. Response content: {res.text[:200]}")
+
+
+async def get_points(client):
+    """Fetch current points from the Gist"""
+    res = await request(client, "GET", gist_url(), headers=gist_headers())
+    return parse_points(res.json())
+
+
+async def save_points(client, data):
+    """Save points back to the Gist"""
+    await request(client, "PATCH", gist_url(), json=points_payload(data), headers=gist_headers())
 
 def sort_tasks(tasks):
     """Sort into overdue and due_soon buckets"""
@@ -152,40 +234,76 @@ def notifier(overdue, due_soon):
 
 
 
-if __name__ == "__main__":
+async def run(client=None):
+    """
+    One manager pass: notify about overdue / due soon tasks, then charge the overdue penalties
+
+    :param client: An httpx.AsyncClient to use instead of a fresh pooled one (local stand-ins)
+    :return report: Per stage timings and outcomes
+    """
+    report = Report()
+    own_client = client is None
+    if own_client:
+        client = httpx.AsyncClient(
+            timeout=REQUEST_TIMEOUT,
+            limits=httpx.Limits(max_connections=10, max_keepalive_connections=10)
+        )
+
     try:
+     # Wake the API up and fetch its tasks while the Gist is read in parallel
+        async def fetch_tasks():
+            async with report.stage("warm api") as stage:
+                await warm_api(client)
+            if not stage["ok"]:
+                return None
+            async with report.stage("fetch tasks") as stage:
+                tasks = await get_tasks(client)
+                stage["detail"] = f"{len(tasks)} tasks"
+                return tasks
+
+        async def fetch_points():
+            async with report.stage("fetch gist"):
+                return await get_points(client)
+
+        tasks, point_sys = await asyncio.gather(fetch_tasks(), fetch_points())
+
 ######## NOTIFICATION ALERTER
-        print("=== Starting 'Notifier' ===")
-        
-     # Get all active tasks
-        tasks = get_tasks()
-        
         if tasks is None:
             print("[ERROR] - Critical error fetching tasks. Exiting.")
-            sys.exit(1)
-
-     # Sort all active tasks into those which are overdue OR due soon        
-        print(f"\nRetrieved {len(tasks)} tasks")
-        overdue, due_soon = sort_tasks(tasks)
-        print(f"Overdue: {len(overdue)}")
-        print(f"Due Soon: {len(due_soon)}")
-     
+            return report
+
+     # Sort all active tasks into those which are overdue OR due soon
+        async with report.stage("classify") as stage:
+            overdue, due_soon = sort_tasks(tasks)
+            stage["detail"] = f"{len(overdue)} overdue, {len(due_soon)} due soon"
+
      # Send out notifications to alert you of impending tasks
-        sent_count = notifier(overdue, due_soon)
-        print(f"Sent {sent_count} notifications\n")
-        print("=== Completed ===")
+        async with report.stage("notify") as stage:
+            stage["detail"] = f"{notifier(overdue, due_soon)} sent"
 
 ######## POINTS SYSTEM
-        print("=== Starting 'Game State Updater' ===")
+        if point_sys is None:
+            return report
 
-     # Update the points system
-        point_sys = get_points()
-        for task in overdue:
-            penalty = penalize_overdue(task, point_sys)
-        save_points(point_sys)
-        
-        print("=== Completed ===")
-        
-    except Exception as e:
-        print(f"Unhandled exception: {str(e)}")
-        sys.exit(1)
\ No newline at end of file
+        async with report.stage("penalize") as stage:
+            penalties = [penalize_overdue(task, point_sys) for task in overdue]
+            charged = sum(1 for penalty in penalties if penalty)
+            stage["detail"] = f"{charged} penalties, -{sum(penalties)} points"
+
+     # Only write the Gist back when something was actually deducted
+        async with report.stage("save gist") as stage:
+            if charged:
+                await save_points(client, point_sys)
+            else:
+                stage["detail"] = "skipped, nothing changed"
+
+        return report
+    finally:
+        if own_client:
+            await client.aclose()
+
+
+if __name__ == "__main__":
+    report = asyncio.run(run())
+    report.print()
+    sys.exit(0 if report.ok else 1)
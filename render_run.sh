@@ -1,3 +1,3 @@
 pip install -r requirement.txt
 
-uvicorn main:app --host 0.0.0.0 --port $PORT
\ No newline at end of file
+uvicorn main:app --host 0.0.0.0 --port $PORT --workers ${WEB_CONCURRENCY:-1}
\ No newline at end of file
@@ -7,16 +7,27 @@ import zoneinfo
 # Configuration
 GIST_ID = os.getenv("GH_GIST_ID")  # Create one gist, use forever
 GITHUB_TOKEN = os.getenv("GH_GIST_PAT")
+GIST_API = os.getenv("GIST_API_URL", "https://api.github.com")  # Point at a local stand-in to run offline
 EASTERN_TZ = zoneinfo.ZoneInfo("America/New_York")
 
 
+def gist_url():
+    return f"{GIST_API}/gists/{GIST_ID}"
+
+
+def gist_headers():
+    return {"Authorization": f"token {GITHUB_TOKEN}"}
+
+
 def get_points():
     """Fetch current points from Gist"""
-    res = requests.get(
-        f"https://api.github.com/gists/{GIST_ID}",
-        headers={"Authorization": f"token {GITHUB_TOKEN}"}
-    )
-    content = res.json()['files']['points.json']['content']
+    res = requests.get(gist_url(), headers=gist_headers())
+    return parse_points(res.json())
+
+
+def parse_points(gist):
+    """Pull points.json out of a GET /gists/{id} response body, filling in the template if it is empty"""
+    content = gist['files']['points.json']['content']
     json_content = json.loads(content)
     if not json_content:
         print(f"The JSON object returned from GH Gist is empty. Setting up template now...")
@@ -39,15 +50,16 @@ def get_points():
 
 def save_points(data):
     """Save points back to Gist"""
-    requests.patch(
-        f"https://api.github.com/gists/{GIST_ID}",
-        json={
-            "files": {
-                "points.json": {"content": json.dumps(data, indent=2)}
-            }
-        },
-        headers={"Authorization": f"token {GITHUB_TOKEN}"}
-    )
+    requests.patch(gist_url(), json=points_payload(data), headers=gist_headers())
+
+
+def points_payload(data):
+    """PATCH /gists/{id} body replacing points.json with data"""
+    return {
+        "files": {
+            "points.json": {"content": json.dumps(data, indent=2)}
+        }
+    }
 
 
 def calculate_points(task, points_data):
@@ -0,0 +1,271 @@
+import zoneinfo
+from datetime import datetime, date, timezone
+from typing import Dict, List, Optional, Tuple
+from utils.clients import get_supabase, select_all
+from utils.tags import tag_paths_by_id
+
+EASTERN_TZ = zoneinfo.ZoneInfo("America/New_York")
+
+# Buckets live in the daily_rollups / task_streaks tables (see the schema in README.md).
+# A completion is counted once in the category bucket (tag_path = '') and once in every
+# tag path bucket of the task, so category totals never double count multi-tagged tasks.
+CATEGORY_BUCKET = ""
+ROLLUP_CONFLICT = "day,category,tag_path"
+BATCH_SIZE = 500
+
+
+def completion_day(completed_at=None) -> str:
+    """
+    Bucket a completion timestamp into its (Eastern) calendar day
+
+    :param completed_at: An ISO timestamp string / datetime, or None for right now
+    :return day: The day as a YYYY-MM-DD string
+    """
+    if completed_at is None:
+        moment = datetime.now(timezone.utc)
+    elif isinstance(completed_at, datetime):
+        moment = completed_at
+    else:
+        moment = datetime.fromisoformat(completed_at.replace('Z', '+00:00'))
+
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+
+    return moment.astimezone(EASTERN_TZ).date().isoformat()
+
+
+def _empty_bucket(day, category, tag_path):
+    return {
+        "day": day,
+        "category": category,
+        "tag_path": tag_path,
+        "points": 0,
+        "completions": 0,
+        "late": 0,
+        "minutes": 0
+    }
+
+
+def _add_to_bucket(bucket, completion):
+    bucket["points"] += completion.get("points") or 0
+    bucket["completions"] += 1
+    bucket["late"] += 1 if completion.get("was_late") else 0
+    bucket["minutes"] += completion.get("time_spent_minutes") or 0
+
+
+def _advance_streak(streak, day, was_late):
+    """Apply one completion to a streak record (on-time extends it, late resets it)"""
+    streak["current_streak"] = 0 if was_late else streak["current_streak"] + 1
+    streak["longest_streak"] = max(streak["longest_streak"], streak["current_streak"])
+    streak["last_day"] = day
+    return streak
+
+
+def tag_paths_for(tag_ids, category) -> List[str]:
+    """Get the full paths of a task's tags with one query instead of one query per ancestor"""
+    if not tag_ids:
+        return []
+
+    tags = select_all('tags', where=lambda query: query.eq('category', category))
+    paths = tag_paths_by_id(tags)
+
+    return [paths[tag_id] for tag_id in tag_ids if tag_id in paths]
+
+
+def record_completion(task_data, completion_record, tag_paths: List[str], completed_at=None):
+    """
+    Incrementally fold one completion into the daily rollups (and the streak of a recurring task)
+
+    :param task_data: The row from the tasks table that was completed
+    :param completion_record: The row inserted into the task_completions table
+    :param tag_paths: The full tag paths attached to the task
+    :param completed_at: When the task was completed (defaults to now)
+    """
+    day = completion_day(completed_at)
+    category = task_data['category']
+
+ # The increments happen in the database (see increment_rollups / advance_streak in README.md), so that
+  # concurrent completions landing in the same bucket can't overwrite each other's totals
+    buckets = []
+    for path in [CATEGORY_BUCKET] + sorted(set(tag_paths)):
+        bucket = _empty_bucket(day, category, path)
+        _add_to_bucket(bucket, completion_record)
+        buckets.append(bucket)
+    get_supabase().rpc('increment_rollups', {"buckets": buckets}).execute()
+
+    if task_data.get('is_recurring'):
+        get_supabase().rpc('advance_streak', {
+            "p_task_id": task_data['id'],
+            "p_day": day,
+            "p_late": bool(completion_record.get('was_late'))
+        }).execute()
+
+
+def remove_completions(task_data, completions: List[dict], tag_paths: List[str]):
+    """
+    Take a deleted task's completions back out of the daily rollups, as one negative increment per bucket
+
+    :param task_data: The row from the tasks table being deleted
+    :param completions: Its task_completions rows (completed_at, points, was_late, time_spent_minutes)
+    :param tag_paths: The full tag paths attached to the task (the buckets a rebuild would count it in)
+    """
+    buckets: Dict[Tuple[str, str, str], dict] = {}
+    for completion in completions:
+        day = completion_day(completion['completed_at'])
+        for path in [CATEGORY_BUCKET] + sorted(set(tag_paths)):
+            key = (day, task_data['category'], path)
+            if key not in buckets:
+                buckets[key] = _empty_bucket(*key)
+            _add_to_bucket(buckets[key], completion)
+
+    rows = list(buckets.values())
+    for bucket in rows:
+        for column in ("points", "completions", "late", "minutes"):
+            bucket[column] = -bucket[column]
+
+ # increment_rollups drops the buckets this empties, so the analytics match what a rebuild would write
+    for i in range(0, len(rows), BATCH_SIZE):
+        get_supabase().rpc('increment_rollups', {"buckets": rows[i:i + BATCH_SIZE]}).execute()
+
+
+def rebuild_rollups() -> Dict[str, int]:
+    """
+    Rebuild every rollup bucket and streak from the raw task_completions history
+
+    :return summary: How many completions were scanned and how many rows were written
+    """
+    paths = tag_paths_by_id(select_all('tags'))
+
+    task_paths = {}
+    for link in select_all('task_tags', "task_id, tag_id"):
+        if link['tag_id'] in paths:
+            task_paths.setdefault(link['task_id'], []).append(paths[link['tag_id']])
+
+    buckets: Dict[Tuple[str, str, str], dict] = {}
+    streaks: Dict[int, dict] = {}
+    scanned = 0
+    offset = 0
+
+ # Page through history oldest first so the streaks replay in order
+    while True:
+        page = get_supabase().table('task_completions').select(
+            "task_id, completed_at, points, was_late, time_spent_minutes, tasks(category, is_recurring)"
+        ).order('completed_at').range(offset, offset + BATCH_SIZE - 1).execute().data
+
+        for completion in page:
+            task = completion.get('tasks') or {}
+            category = task.get('category')
+            if not category:
+                continue
+
+            day = completion_day(completion['completed_at'])
+            for path in [CATEGORY_BUCKET] + sorted(set(task_paths.get(completion['task_id'], []))):
+                key = (day, category, path)
+                if key not in buckets:
+                    buckets[key] = _empty_bucket(day, category, path)
+                _add_to_bucket(buckets[key], completion)
+
+            if task.get('is_recurring'):
+                streak = streaks.setdefault(completion['task_id'], {
+                    "task_id": completion['task_id'],
+                    "current_streak": 0,
+                    "longest_streak": 0,
+                    "last_day": None
+                })
+                _advance_streak(streak, day, completion.get('was_late'))
+
+        scanned += len(page)
+        if len(page) < BATCH_SIZE:
+            break
+        offset += BATCH_SIZE
+
+ # Overwrite the buckets in place, then drop the ones nothing maps to any more: a rebuild that
+  # fails part way leaves the old numbers (partly refreshed) instead of empty analytics
+    rows = list(buckets.values())
+    for i in range(0, len(rows), BATCH_SIZE):
+        get_supabase().table('daily_rollups').upsert(rows[i:i + BATCH_SIZE], on_conflict=ROLLUP_CONFLICT).execute()
+
+    streak_rows = list(streaks.values())
+    for i in range(0, len(streak_rows), BATCH_SIZE):
+        get_supabase().table('task_streaks').upsert(streak_rows[i:i + BATCH_SIZE], on_conflict="task_id").execute()
+
+    stale = [
+        row['id'] for row in select_all('daily_rollups', "day, category, tag_path")
+        if (row['day'], row['category'], row['tag_path']) not in buckets
+    ]
+    for i in range(0, len(stale), BATCH_SIZE):
+        get_supabase().table('daily_rollups').delete().in_('id', stale[i:i + BATCH_SIZE]).execute()
+
+    stale_streaks = [
+        row['task_id'] for row in select_all('task_streaks', "task_id", key='task_id')
+        if row['task_id'] not in streaks
+    ]
+    for i in range(0, len(stale_streaks), BATCH_SIZE):
+        get_supabase().table('task_streaks').delete().in_('task_id', stale_streaks[i:i + BATCH_SIZE]).execute()
+
+    return {"completions_scanned": scanned, "buckets": len(rows), "streaks": len(streak_rows)}
+
+
+def query_rollups(start: Optional[date] = None, end: Optional[date] = None,
+                  category: Optional[str] = None, tag_path: Optional[str] = CATEGORY_BUCKET) -> List[dict]:
+    """
+    Fetch rollup buckets in a day range, oldest first
+
+    :param tag_path: Only this tag path ('' = category totals, None = every bucket)
+    """
+    def where(query):
+        if start:
+            query = query.gte('day', start.isoformat())
+        if end:
+            query = query.lte('day', end.isoformat())
+        if category:
+            query = query.eq('category', category)
+        if tag_path is not None:
+            query = query.eq('tag_path', tag_path)
+        return query
+
+ # Paged by id (a long range is more buckets than one response holds), so sorted by day here
+    rows = select_all('daily_rollups', "id, day, category, tag_path, points, completions, late, minutes", where=where)
+    rows.sort(key=lambda row: row['day'])
+    for row in rows:
+        del row['id']
+    return rows
+
+
+def late_ratios(rows: List[dict]) -> List[dict]:
+    """Collapse rollup buckets into a late ratio per (category, tag path)"""
+    totals = {}
+    for row in rows:
+        key = (row['category'], row['tag_path'])
+        total = totals.setdefault(key, {
+            "category": row['category'],
+            "tag_path": row['tag_path'],
+            "completions": 0,
+            "late": 0
+        })
+        total["completions"] += row['completions']
+        total["late"] += row['late']
+
+    for total in totals.values():
+        total["late_ratio"] = round(total["late"] / total["completions"], 4) if total["completions"] else 0.0
+
+    return sorted(totals.values(), key=lambda t: (t['category'], t['tag_path']))
+
+
+def get_streaks() -> List[dict]:
+    """Current and longest streak of every recurring task"""
+    rows = select_all(
+        'task_streaks', "task_id, current_streak, longest_streak, last_day, tasks(title, category, recurrence_pattern)",
+        key='task_id'
+    )
+    rows.sort(key=lambda row: row['current_streak'], reverse=True)
+
+    return [{
+        "task_id": row['task_id'],
+        "task_title": (row.get('tasks') or {}).get('title'),
+        "task_category": (row.get('tasks') or {}).get('category'),
+        "recurrence_pattern": (row.get('tasks') or {}).get('recurrence_pattern'),
+        "current_streak": row['current_streak'],
+        "longest_streak": row['longest_streak'],
+        "last_day": row['last_day']
+    } for row in rows]
@@ -0,0 +1,96 @@
+import os
+from typing import AsyncIterator, List, Tuple
+from fastapi import HTTPException, Request
+from pydantic import ValidationError
+from utils.data import TaskCreate, BulkRowStatus
+from utils.serialization import loads
+
+# Rows validated and inserted per round trip, and the most one import may contain
+CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", "500"))
+MAX_ROWS = int(os.getenv("BULK_MAX_ROWS", "5000"))
+
+NDJSON_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl", "application/json-lines")
+
+
+def task_record(task: TaskCreate) -> dict:
+    """The tasks row for a validated TaskCreate"""
+    return {
+        "title": task.title,
+        "description": task.description,
+        "category": task.category,
+        "priority": task.priority,
+        "due_date": task.due_date.isoformat() if task.due_date else None,
+        "is_recurring": task.is_recurring,
+        "recurrence_pattern": task.recurrence_pattern
+    }
+
+
+async def read_rows(request: Request) -> AsyncIterator[Tuple[int, object]]:
+    """
+    Yield (index, decoded row) from a JSON array body, or line by line from an NDJSON body as it streams in.
+    A line that isn't valid JSON is yielded as None so that it gets its own error status.
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+
+    if content_type not in NDJSON_TYPES:
+        try:
+            rows = loads(await request.body())
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Body must be a JSON array of tasks or NDJSON")
+        if not isinstance(rows, list):
+            raise HTTPException(status_code=400, detail="Body must be a JSON array of tasks or NDJSON")
+        for index, row in enumerate(rows):
+            yield index, row
+        return
+
+    index, buffer = 0, b""
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield index, _decode_line(line)
+                index += 1
+    if buffer.strip():
+        yield index, _decode_line(buffer)
+
+
+def _decode_line(line: bytes):
+    try:
+        return loads(line)
+    except ValueError:
+        return None
+
+
+async def read_chunks(request: Request) -> AsyncIterator[List[Tuple[int, object]]]:
+    """read_rows() grouped into CHUNK_SIZE lists"""
+    chunk = []
+    async for index, row in read_rows(request):
+        chunk.append((index, row))
+        if len(chunk) == CHUNK_SIZE:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def validate_chunk(chunk: List[Tuple[int, object]]) -> Tuple[List[Tuple[int, dict]], List[BulkRowStatus]]:
+    """
+    Validate one chunk of rows against TaskCreate
+
+    :return valid, invalid: (index, tasks row) for the rows to insert, and the statuses of the rejected ones
+    """
+    valid, invalid = [], []
+    for index, row in chunk:
+        if index >= MAX_ROWS:
+            invalid.append(BulkRowStatus(index=index, status="invalid", error=f"Over the {MAX_ROWS} tasks per import limit"))
+            continue
+        if row is None:
+            invalid.append(BulkRowStatus(index=index, status="invalid", error="Invalid JSON"))
+            continue
+        try:
+            valid.append((index, task_record(TaskCreate.model_validate(row))))
+        except ValidationError as e:
+            error = "; ".join(f"{'.'.join(str(part) for part in err['loc']) or 'row'}: {err['msg']}" for err in e.errors())
+            invalid.append(BulkRowStatus(index=index, status="invalid", error=error))
+    return valid, invalid
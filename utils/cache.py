@@ -0,0 +1,153 @@
+import os, time, pickle, sqlite3, threading
+from pathlib import Path
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+from utils.metrics import increment
+
+# Cache tier shared by every uvicorn worker on this host: a SQLite file holding one version counter
+# per namespace, the cached values themselves, and a short log of task change events.
+PATH = os.getenv("CACHE_PATH", str(Path(__file__).parent.parent / "data" / "cache.sqlite3"))
+WORKERS = int(os.getenv("WEB_CONCURRENCY", "1") or 1)
+POLL_SECONDS = float(os.getenv("CACHE_POLL_SECONDS", "0.5"))
+
+# Writes made outside this API (manager.py, the Supabase dashboard) never bump a version, so every entry also expires
+TTL_SECONDS = float(os.getenv("CACHE_TTL_SECONDS", "60"))
+EVENT_RETENTION = 1000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS versions (namespace TEXT PRIMARY KEY, version INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS entries (
+    namespace TEXT, key TEXT, version INTEGER, expires_at REAL, value BLOB,
+    PRIMARY KEY (namespace, key)
+);
+CREATE TABLE IF NOT EXISTS events (seq INTEGER PRIMARY KEY AUTOINCREMENT, origin INTEGER, type TEXT, data BLOB);
+"""
+
+
+class SharedCache:
+    """
+    Two-tier cache that stays coherent across worker processes.
+
+    Values are grouped into namespaces ("tasks", "completions", ...), each with a version counter
+    in the shared file. get() serves a value only if it was computed at the namespace's current
+    version, first from this process' memory, then from the shared file, and computes it otherwise.
+    invalidate() bumps the counter, which drops that namespace in every worker at once.
+
+    Workers also share a short event log so that in-process state which is not a plain cached
+    value, like the search index or SSE subscribers, can catch up with writes made through
+    another worker: see publish() and poll().
+    """
+
+    def __init__(self, path: str = PATH, ttl: float = TTL_SECONDS):
+        self.path = path
+        self.ttl = ttl
+        self._local: Dict[Tuple[str, str], Tuple[int, float, Any]] = {}
+        self._last_event: Optional[int] = None
+        self._lock = threading.RLock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+
+    def _connect(self) -> sqlite3.Connection:
+     # One connection per process (uvicorn workers are separate processes)
+        if self._db is None or self._pid != os.getpid():
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.executescript(SCHEMA)
+            self._pid = os.getpid()
+            self._local.clear()
+        return self._db
+
+    # Versions
+    def version(self, namespace: str) -> int:
+        with self._lock:
+            row = self._connect().execute("SELECT version FROM versions WHERE namespace = ?", (namespace,)).fetchone()
+        return row[0] if row else 0
+
+    def invalidate(self, *namespaces: str):
+        """Bump the version of each namespace, dropping its cached values in every worker"""
+        with self._lock:
+            db = self._connect()
+            for namespace in namespaces:
+                db.execute(
+                    "INSERT INTO versions (namespace, version) VALUES (?, 1) "
+                    "ON CONFLICT (namespace) DO UPDATE SET version = version + 1",
+                    (namespace,)
+                )
+                for key in [key for key in self._local if key[0] == namespace]:
+                    del self._local[key]
+                increment("cache_invalidations_total", namespace=namespace)
+
+    # Values
+    def get(self, namespace: str, key: Hashable, compute: Callable[[], Any], ttl: Optional[float] = None) -> Any:
+        """
+        The cached value of key in namespace, computed (and shared with the other workers) on a miss.
+        Values are shared between callers, so treat them as read-only.
+        """
+        key = repr(key)
+        ttl = self.ttl if ttl is None else ttl
+        version = self.version(namespace)
+        now = time.time()
+
+        entry = self._local.get((namespace, key))
+        if entry is not None and entry[0] == version and entry[1] > now:
+            increment("cache_requests_total", namespace=namespace, result="local")
+            return entry[2]
+
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT version, expires_at, value FROM entries WHERE namespace = ? AND key = ?", (namespace, key)
+            ).fetchone()
+        if row is not None and row[0] == version and row[1] > now:
+            value = pickle.loads(row[2])
+            self._local[(namespace, key)] = (version, row[1], value)
+            increment("cache_requests_total", namespace=namespace, result="shared")
+            return value
+
+        increment("cache_requests_total", namespace=namespace, result="miss")
+     # Stamped with the version read *before* computing: an invalidation racing the computation leaves it stale
+        value = compute()
+        expires_at = time.time() + ttl
+        with self._lock:
+            self._connect().execute(
+                "INSERT OR REPLACE INTO entries (namespace, key, version, expires_at, value) VALUES (?, ?, ?, ?, ?)",
+                (namespace, key, version, expires_at, pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+            )
+            self._local[(namespace, key)] = (version, expires_at, value)
+        return value
+
+    # Cross-worker notifications
+    def publish(self, kind: str, data: Any):
+        """Append a task change event for the other workers to pick up in poll()"""
+        with self._lock:
+            db = self._connect()
+            seq = db.execute(
+                "INSERT INTO events (origin, type, data) VALUES (?, ?, ?)",
+                (os.getpid(), kind, pickle.dumps(data, pickle.HIGHEST_PROTOCOL))
+            ).lastrowid
+            if seq % 100 == 0:
+                db.execute("DELETE FROM events WHERE seq <= ?", (seq - EVENT_RETENTION,))
+
+    def poll(self) -> List[Tuple[str, Any]]:
+        """(type, data) of the events other workers published since the last poll"""
+        with self._lock:
+            db = self._connect()
+            if self._last_event is None:
+                self._last_event = db.execute("SELECT COALESCE(MAX(seq), 0) FROM events").fetchone()[0]
+            rows = db.execute(
+                "SELECT seq, origin, type, data FROM events WHERE seq > ? ORDER BY seq", (self._last_event,)
+            ).fetchall()
+            if rows:
+                self._last_event = rows[-1][0]
+
+        return [(kind, pickle.loads(data)) for _, origin, kind, data in rows if origin != os.getpid()]
+
+    def clear(self):
+        """Forget every cached value (versions keep counting up)"""
+        with self._lock:
+            self._connect().execute("DELETE FROM entries")
+            self._local.clear()
+
+
+# The cache shared by every endpoint in this process (and, through the file, every worker)
+cache = SharedCache()
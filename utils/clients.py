@@ -0,0 +1,123 @@
+import os, time, threading, importlib
+from typing import Any, Callable, Dict, List, Optional
+from utils.metrics import instrument_client
+
+# One lazily built instance of every external client, shared by main.py and utils/*.
+# Nothing heavy (supabase, anthropic, requests) is imported until a client is first needed.
+_lock = threading.Lock()
+_clients: Dict[str, Any] = {}
+_factories: Dict[str, Callable[[], Any]] = {}
+_warmers: List[Callable[[], Any]] = []
+
+
+def register(name, factory: Callable[[], Any]):
+    """Declare how to build a client; it is only built on first get()"""
+    _factories[name] = factory
+
+
+def override(name, client):
+    """Swap in an already built client (used by the benchmarks and local stand-ins)"""
+    with _lock:
+        _clients[name] = client
+
+
+def get(name):
+    """Return the shared client, building it on first use"""
+    client = _clients.get(name)
+    if client is not None:
+        return client
+
+    with _lock:
+        if name not in _clients:
+            _clients[name] = _factories[name]()
+        return _clients[name]
+
+
+def on_warm(func: Callable[[], Any]):
+    """Register a cache warmer to run (after the clients are built) when WARM_START is set"""
+    _warmers.append(func)
+    return func
+
+
+def warm() -> Dict[str, float]:
+    """
+    Build every registered client and run the warmers, timing each step
+
+    :return timings: Seconds spent per client / warmer
+    """
+    timings = {}
+    for name in list(_factories):
+        start = time.perf_counter()
+        get(name)
+        timings[name] = time.perf_counter() - start
+
+    for warmer in _warmers:
+        start = time.perf_counter()
+        try:
+            warmer()
+        except Exception as e:
+            print(f"[ERROR] - Warmer {warmer.__name__} failed: {str(e)}")
+        timings[warmer.__name__] = time.perf_counter() - start
+
+    print("[WARM] - " + ", ".join(f"{name}: {seconds * 1000:.0f}ms" for name, seconds in timings.items()))
+    return timings
+
+
+def _build_supabase():
+    from supabase import create_client
+    return instrument_client(create_client(
+        os.getenv("SUPABASE_URL"),
+        os.getenv("SUPABASE_KEY")
+    ))
+
+
+def _build_anthropic():
+    from anthropic import Anthropic
+    return Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
+
+
+register("supabase", _build_supabase)
+register("anthropic", _build_anthropic)
+register("gist", lambda: importlib.import_module("scripts.game_tracker"))
+
+
+def get_supabase():
+    return get("supabase")
+
+
+# PostgREST returns at most this many rows per request (the Supabase default max-rows)
+PAGE_SIZE = 1000
+
+
+def select_all(table, columns="*", where: Optional[Callable[[Any], Any]] = None, key: str = "id",
+               page_size: int = PAGE_SIZE) -> List[dict]:
+    """
+    Every matching row of a table, paged by a unique key so that no read is cut off at the server's row cap
+
+    :param where: Adds filters to each page's query, e.g. lambda q: q.eq('is_active', True)
+    :param key: The unique column to page on (the primary key)
+    """
+    if columns != "*" and key not in [column.strip() for column in columns.split(",")]:
+        columns = f"{key}, " + columns
+
+    rows, last = [], None
+    while True:
+        query = get_supabase().table(table).select(columns)
+        if where is not None:
+            query = where(query)
+        if last is not None:
+            query = query.gt(key, last)
+        page = query.order(key).limit(page_size).execute().data
+        rows += page
+        if len(page) < page_size:
+            return rows
+        last = page[-1][key]
+
+
+def get_anthropic():
+    return get("anthropic")
+
+
+def get_gist():
+    """The points store: anything with get_points() / save_points(data), scripts.game_tracker by default"""
+    return get("gist")
@@ -0,0 +1,284 @@
+import os, re, sys, json, time, argparse
+from difflib import SequenceMatcher
+from typing import Dict, List
+from postgrest.exceptions import APIError
+from utils.clients import get_supabase, select_all
+from utils.tags import tag_paths_by_id
+
+# Two differing words of a sibling pair count as the same word (a typo) when at least this similar.
+# Lower values start pairing real words ("Painting" / "Printing"), and merges can't be undone.
+MIN_SIMILARITY = 0.9
+SIMILARITY = max(MIN_SIMILARITY, float(os.getenv("TAG_SIMILARITY", "0.92")))
+
+# Apply through the apply_tag_compaction() Postgres function (one transaction, see README). Set to 0, or leave the
+# function uninstalled, to write the plan as ordered bulk statements instead
+USE_RPC = os.getenv("TAG_COMPACTION_RPC", "1") not in ("", "0")
+
+# What PostgREST / Postgres answer when the function doesn't exist
+MISSING_FUNCTION = ("PGRST202", "42883")
+
+BATCH_SIZE = 500
+WORD = re.compile(r"[a-z0-9+#]+")  # keep C / C++ / C# apart
+FUZZY_MIN_LENGTH = 5
+
+# Abbreviations merged with their long form. Only these: a bare prefix rule pairs "Pro" with "Programming"
+ABBREVIATIONS = [
+    ("admin", "administration"), ("app", "application"), ("auth", "authentication"), ("biz", "business"),
+    ("calc", "calculus"), ("chem", "chemistry"), ("comp", "computer"), ("config", "configuration"),
+    ("db", "database"), ("dev", "development"), ("doc", "documentation"), ("eng", "engineering"),
+    ("env", "environment"), ("info", "information"), ("lang", "language"), ("lit", "literature"),
+    ("math", "mathematics"), ("maths", "mathematics"), ("mgmt", "management"), ("org", "organization"),
+    ("perf", "performance"), ("prog", "programming"), ("psych", "psychology"), ("repo", "repository"),
+    ("sci", "science"), ("stat", "statistics"),
+]
+
+
+def normalize(name: str) -> List[str]:
+    """Lowercase words with simple plurals folded ("Web-Apps" -> ["web", "apps"], "Notes" -> ["note"])"""
+    words = WORD.findall((name or "").lower())
+ # Short words and -ss / -us / -is endings are left alone: "News", "Status", "Analysis" aren't plurals
+    return [
+        word[:-1] if len(word) > 4 and word.endswith("s") and not word.endswith(("ss", "us", "is")) else word
+        for word in words
+    ]
+
+
+_ABBREVIATIONS = {(normalize(short)[0], normalize(long)[0]) for short, long in ABBREVIATIONS}
+
+
+def _same_word(x: str, y: str, threshold: float) -> bool:
+    if x == y:
+        return True
+    if (x, y) in _ABBREVIATIONS or (y, x) in _ABBREVIATIONS:
+        return True
+ # "Python 2" / "Python 3" and "Level 1" / "Level 10" are different things however close the strings are
+    if any(c.isdigit() for c in x + y):
+        return False
+    return min(len(x), len(y)) >= FUZZY_MIN_LENGTH and SequenceMatcher(None, x, y).ratio() >= threshold
+
+
+def similar(a: str, b: str, threshold: float = SIMILARITY) -> bool:
+    """
+    Whether two sibling tag names mean the same thing: equal once normalized ("Front-end" / "Frontend",
+    "Note" / "Notes"), or the same words one by one, where a word may be a listed abbreviation
+    ("Web Dev" / "Web Development") or a near-identical spelling ("Meditaton" / "Meditation")
+    """
+    words_a, words_b = normalize(a), normalize(b)
+    if not words_a or not words_b:
+        return False
+    if "".join(words_a) == "".join(words_b):
+        return True
+    if len(words_a) != len(words_b):
+        return False
+    return all(_same_word(x, y, threshold) for x, y in zip(words_a, words_b))
+
+
+def plan_compaction(tags: List[dict], links: List[dict], threshold: float = SIMILARITY) -> dict:
+    """
+    Work out how to merge near-duplicate siblings and prune unused leaves (nothing is written)
+
+    Siblings are compared within the same parent and category. The survivor of a group is the tag
+    with the most links below it (oldest on ties). Merging moves the loser's children under the
+    survivor, so the pass repeats until the newly combined children have no duplicates either.
+
+    :param tags: Every row of the tags table
+    :param links: Every row of task_tags (id, task_id, tag_id)
+    :return plan: The merges and prunes, plus the flat row changes needed to apply them
+    """
+    if not MIN_SIMILARITY <= threshold <= 1.0:
+        raise ValueError(f"threshold must be between {MIN_SIMILARITY} and 1.0")
+
+    by_id = {tag['id']: dict(tag) for tag in tags}
+    paths = tag_paths_by_id(tags)
+    link_count = {}
+    for link in links:
+        link_count[link['tag_id']] = link_count.get(link['tag_id'], 0) + 1
+
+    def weight(tag_id):
+        """Links on the tag and everything below it"""
+        if tag_id not in weights:
+            weights[tag_id] = link_count.get(tag_id, 0) + sum(weight(child) for child in children.get(tag_id, ()))
+        return weights[tag_id]
+
+    merged_into: Dict[int, int] = {}
+    merges = []
+    while True:
+        children, groups, weights = {}, {}, {}
+        for tag in by_id.values():
+            children.setdefault(tag.get('parent_tag_id'), []).append(tag['id'])
+            groups.setdefault((tag.get('parent_tag_id'), tag['category']), []).append(tag)
+
+        changed = False
+        for siblings in groups.values():
+            siblings.sort(key=lambda tag: (-weight(tag['id']), tag['id']))
+            survivors = []
+            for tag in siblings:
+                target = next((s for s in survivors if similar(s['name'], tag['name'], threshold)), None)
+                if target is None:
+                    survivors.append(tag)
+                    continue
+                merges.append({"from": tag['id'], "from_path": paths.get(tag['id']),
+                               "into": target['id'], "into_path": paths.get(target['id'])})
+                merged_into[tag['id']] = target['id']
+                for child in children.get(tag['id'], ()):
+                    by_id[child]['parent_tag_id'] = target['id']
+                del by_id[tag['id']]
+                changed = True
+        if not changed:
+            break
+
+    def resolve(tag_id):
+        while tag_id in merged_into:
+            tag_id = merged_into[tag_id]
+        return tag_id
+
+ # Links: re-point the ones on merged tags, dropping any that would duplicate an existing link
+    seen, link_updates, link_deletes = set(), [], []
+    for link in sorted(links, key=lambda link: link['tag_id'] in merged_into):
+        tag_id = resolve(link['tag_id'])
+        if (link['task_id'], tag_id) in seen:
+            link_deletes.append(link['id'])
+            continue
+        seen.add((link['task_id'], tag_id))
+        if tag_id != link['tag_id']:
+            link_updates.append({"id": link['id'], "tag_id": tag_id})
+
+ # Prune leaves nothing links to, bottom up (a parent can become an empty leaf in turn)
+    used = {tag_id for _, tag_id in seen}
+    pruned, pruned_rows = [], []
+    while True:
+        parents = {tag.get('parent_tag_id') for tag in by_id.values()}
+        empty = [tag_id for tag_id in by_id if tag_id not in parents and tag_id not in used]
+        if not empty:
+            break
+        for tag_id in empty:
+            pruned.append({"id": tag_id, "path": paths.get(tag_id)})
+            pruned_rows.append(by_id.pop(tag_id))
+
+    original_parents = {tag['id']: tag.get('parent_tag_id') for tag in tags}
+    parent_updates = [
+        {"id": tag_id, "parent_tag_id": tag.get('parent_tag_id')}
+        for tag_id, tag in by_id.items() if tag.get('parent_tag_id') != original_parents[tag_id]
+    ]
+
+    return {
+        "tags_before": len(tags),
+        "tags_after": len(by_id),
+        "merges": merges,
+        "pruned": pruned,
+        "link_updates": link_updates,
+        "link_deletes": link_deletes,
+        "parent_updates": parent_updates,
+        "tag_deletes": list(merged_into) + [tag['id'] for tag in pruned],
+        "merged_into": {tag_id: resolve(tag_id) for tag_id in merged_into},
+        "parents": {tag['id']: tag.get('parent_tag_id') for tag in pruned_rows},
+    }
+
+
+def _batches(items, size=BATCH_SIZE):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def apply_plan(plan: dict):
+    """
+    Write a plan: in one transaction through apply_tag_compaction(), or (TAG_COMPACTION_RPC=0, or the function
+    isn't installed) as grouped bulk statements ordered so that an interruption never leaves a link on a deleted tag
+    """
+    supabase = get_supabase()
+    if USE_RPC:
+        try:
+            supabase.rpc('apply_tag_compaction', {"plan": {
+                key: plan[key] for key in ("link_updates", "link_deletes", "parent_updates", "tag_deletes", "merged_into")
+            }}).execute()
+            return
+        except APIError as e:
+            if e.code not in MISSING_FUNCTION:
+                raise
+            print("[ERROR] - apply_tag_compaction() is not installed, applying the plan statement by statement")
+
+    for ids in _batches(plan["link_deletes"]):
+        supabase.table('task_tags').delete().in_('id', ids).execute()
+
+    by_tag = {}
+    for update in plan["link_updates"]:
+        by_tag.setdefault(update['tag_id'], []).append(update['id'])
+    for tag_id, link_ids in by_tag.items():
+        for ids in _batches(link_ids):
+            supabase.table('task_tags').update({'tag_id': tag_id}).in_('id', ids).execute()
+
+    by_parent = {}
+    for update in plan["parent_updates"]:
+        by_parent.setdefault(update['parent_tag_id'], []).append(update['id'])
+    for parent_id, tag_ids in by_parent.items():
+        for ids in _batches(tag_ids):
+            supabase.table('tags').update({'parent_tag_id': parent_id}).in_('id', ids).execute()
+
+ # A task created since the plan was made may link a doomed tag: follow a merged tag's survivor,
+  # and keep a pruned one (with its pruned ancestors) instead
+    doomed = set(plan["tag_deletes"])
+    for ids in _batches(plan["tag_deletes"]):
+        for link in select_all('task_tags', "id, tag_id", where=lambda query: query.in_('tag_id', ids)):
+            survivor = plan["merged_into"].get(link['tag_id'])
+            if survivor is not None:
+                supabase.table('task_tags').update({'tag_id': survivor}).eq('id', link['id']).execute()
+                continue
+            tag_id = link['tag_id']
+            while tag_id in plan["parents"] and tag_id in doomed:
+                doomed.discard(tag_id)
+                tag_id = plan["parents"][tag_id]
+
+ # The same for a tag created since under a doomed one: it moves to the survivor, or keeps its parents
+    for ids in _batches(plan["tag_deletes"]):
+        for child in select_all('tags', "id, parent_tag_id", where=lambda query: query.in_('parent_tag_id', ids)):
+            if child['id'] in doomed:
+                continue
+            survivor = plan["merged_into"].get(child['parent_tag_id'])
+            if survivor is not None:
+                supabase.table('tags').update({'parent_tag_id': survivor}).eq('id', child['id']).execute()
+                continue
+            tag_id = child['parent_tag_id']
+            while tag_id in plan["parents"] and tag_id in doomed:
+                doomed.discard(tag_id)
+                tag_id = plan["parents"][tag_id]
+
+    for ids in _batches([tag_id for tag_id in plan["tag_deletes"] if tag_id in doomed]):
+        supabase.table('tags').delete().in_('id', ids).execute()
+
+
+def compact_tags(dry_run: bool = True, threshold: float = SIMILARITY) -> dict:
+    """
+    Merge near-duplicate sibling tags and prune unused leaves
+
+    :param dry_run: Only report what would change
+    :return report: Tag counts before / after, every merge and prune, and how many links move
+    """
+    start = time.perf_counter()
+    tags = select_all('tags')
+    links = select_all('task_tags', "task_id, tag_id")
+    plan = plan_compaction(tags, links, threshold)
+
+    if not dry_run and plan["tag_deletes"]:
+        apply_plan(plan)
+
+    return {
+        "dry_run": dry_run,
+        "tags_before": plan["tags_before"],
+        "tags_after": plan["tags_after"],
+        "merged": len(plan["merges"]),
+        "pruned": len(plan["pruned"]),
+        "links_rewritten": len(plan["link_updates"]),
+        "links_dropped": len(plan["link_deletes"]),
+        "merges": plan["merges"],
+        "pruned_tags": plan["pruned"],
+        "seconds": round(time.perf_counter() - start, 3),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Merge near-duplicate tags and prune unused leaves")
+    parser.add_argument("--apply", action="store_true", help="write the changes (default: dry run)")
+    parser.add_argument("--threshold", type=float, default=SIMILARITY, help=f"{MIN_SIMILARITY} to 1.0")
+    args = parser.parse_args()
+    print(json.dumps(compact_tags(dry_run=not args.apply, threshold=args.threshold), indent=2))
+    sys.exit(0)
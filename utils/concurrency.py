@@ -0,0 +1,121 @@
+import os, asyncio, inspect, threading
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict, Hashable
+from fastapi import HTTPException
+from utils.metrics import increment
+from utils.profiling import to_thread
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent identical calls: while a call for a key is in flight, every other caller
+    with the same key waits for (and shares) its result instead of starting another one.
+    Shared results are the same object for every caller, so treat them as read-only.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._tasks: Dict[Hashable, asyncio.Task] = {}
+        self._calls: Dict[Hashable, "_Call"] = {}
+        self._lock = threading.Lock()
+
+    async def do(self, key, func: Callable, *args, **kwargs) -> Any:
+        """
+        Await func(*args, **kwargs) once per key across concurrent callers (sync funcs run in a thread)
+        """
+        task = self._tasks.get(key)
+        if task is None:
+            if inspect.iscoroutinefunction(func):
+                task = asyncio.ensure_future(func(*args, **kwargs))
+            else:
+                task = asyncio.ensure_future(to_thread(func, *args, **kwargs))
+            self._tasks[key] = task
+            task.add_done_callback(lambda _: self._tasks.pop(key, None))
+        else:
+            increment("singleflight_shared_total", flight=self.name)
+
+     # shield: a caller that disconnects must not cancel the work the others are waiting on
+        return await asyncio.shield(task)
+
+    def do_sync(self, key, func: Callable, *args, **kwargs) -> Any:
+        """Same as do() for code already running in worker threads"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            increment("singleflight_shared_total", flight=self.name)
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class Limiter:
+    """
+    Bound how many requests of a route run at once. Requests queue for a free slot for up to
+    queue_timeout seconds, then get shed with 503 + Retry-After.
+    """
+
+    def __init__(self, name, limit: int, queue_timeout: float = 5.0, retry_after: int = 2):
+        self.name = name
+        self.limit = limit
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self._semaphore = asyncio.Semaphore(limit)
+
+    @asynccontextmanager
+    async def slot(self):
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            increment("load_shed_total", limiter=self.name)
+            raise HTTPException(
+                status_code=503,
+                detail=f"Too many concurrent {self.name} requests, retry shortly",
+                headers={"Retry-After": str(self.retry_after)}
+            )
+        try:
+            yield
+        finally:
+            self._semaphore.release()
+
+    async def run(self, func: Callable, *args, **kwargs) -> Any:
+        """
+        Run func inside a slot (sync funcs run in a thread). Pass this to SingleFlight.do so that
+        only the leader of a flight takes a slot: flights.do(key, limiter.run, func, ...)
+        """
+        async with self.slot():
+            if inspect.iscoroutinefunction(func):
+                return await func(*args, **kwargs)
+            return await to_thread(func, *args, **kwargs)
+
+
+def limiter_from_env(name, default_limit: int, default_timeout: float = 5.0) -> Limiter:
+    """Limiter whose limit / queue timeout can be tuned with <NAME>_CONCURRENCY / <NAME>_QUEUE_TIMEOUT"""
+    prefix = name.upper().replace("-", "_")
+    return Limiter(
+        name,
+        limit=int(os.getenv(f"{prefix}_CONCURRENCY", default_limit)),
+        queue_timeout=float(os.getenv(f"{prefix}_QUEUE_TIMEOUT", default_timeout))
+    )
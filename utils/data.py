@@ -1,6 +1,6 @@
 from pydantic import BaseModel, field_validator
-from typing import Optional
-from datetime import datetime
+from typing import List, Optional
+from datetime import datetime, date
 import zoneinfo
 
 
@@ -69,8 +69,53 @@ class CompletionResponse(BaseModel):
     completed_at: datetime
     notes: Optional[str]
     was_late: bool
-    time_spent_minutes: int 
+    time_spent_minutes: Optional[int]
     points: int
 
 class CompletionUpdate(BaseModel):
-    notes: str
\ No newline at end of file
+    notes: str
+
+######## Data definition for POST /api/tasks/bulk
+
+class BulkRowStatus(BaseModel):
+    index: int
+    status: str  # created / invalid / failed
+    id: Optional[int] = None
+    error: Optional[str] = None
+
+class BulkImportResponse(BaseModel):
+    received: int
+    created: int
+    invalid: int
+    failed: int
+    seconds: float
+    rows_per_second: float
+    tagging: str  # queued / skipped / none
+    rows: List[BulkRowStatus]
+
+######## Data definition for the /api/analytics endpoints served from the daily rollups
+
+class DailyRollup(BaseModel):
+    day: date
+    category: str
+    tag_path: str
+    points: int
+    completions: int
+    late: int
+    minutes: int
+
+class LateRatio(BaseModel):
+    category: str
+    tag_path: str
+    completions: int
+    late: int
+    late_ratio: float
+
+class TaskStreak(BaseModel):
+    task_id: int
+    task_title: Optional[str]
+    task_category: Optional[str]
+    recurrence_pattern: Optional[str]
+    current_streak: int
+    longest_streak: int
+    last_day: Optional[date]
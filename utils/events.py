@@ -0,0 +1,130 @@
+import os, time, asyncio
+from collections import deque
+from typing import Any, Callable, Optional
+from utils.metrics import increment
+from utils.serialization import dumps
+
+# How many recent events are kept for Last-Event-ID resumes, and how many may queue per client
+HISTORY_SIZE = int(os.getenv("STREAM_HISTORY_SIZE", "1000"))
+BUFFER_SIZE = int(os.getenv("STREAM_BUFFER_SIZE", "100"))
+HEARTBEAT_SECONDS = 15.0
+
+
+class Subscriber:
+    """One connected /api/stream client with its own bounded buffer"""
+
+    def __init__(self, size):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=size)
+
+
+class EventBroker:
+    """
+    Fan task change events out to every /api/stream subscriber.
+
+    Event ids are "<epoch>-<sequence>" so that a client resuming with an id from before a restart,
+    from another worker (or from too far back to replay) gets a single `resync` event telling it to re-fetch.
+    A subscriber whose buffer fills up is dropped to the same `resync` instead of blocking publishers.
+    """
+
+    def __init__(self, history: int = HISTORY_SIZE, buffer: int = BUFFER_SIZE):
+ # The pid tells apart workers started in the same second: each numbers its events on its own
+        self.epoch = f"{int(time.time())}.{os.getpid()}"
+        self.buffer = buffer
+        self._sequence = 0
+        self._history = deque(maxlen=history)
+        self._subscribers = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+     # Set in multi-worker mode to hand every event to the other workers as well (see utils/cache.py)
+        self.forward: Optional[Callable[[str, Any], Any]] = None
+
+    def _event(self, kind, data):
+        self._sequence += 1
+        return {"id": f"{self.epoch}-{self._sequence}", "seq": self._sequence, "type": kind, "data": data}
+
+    def _resync(self):
+        return {"id": f"{self.epoch}-{self._sequence}", "seq": self._sequence, "type": "resync", "data": {}}
+
+    def publish(self, kind, data):
+        """Broadcast an event (safe to call from worker threads as well as the event loop)"""
+        if self.forward is not None:
+            self.forward(kind, data)
+        self.deliver(kind, data)
+
+    def deliver(self, kind, data):
+        """Broadcast to this process' subscribers only (events relayed from other workers)"""
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            if self._loop is not None:
+                self._loop.call_soon_threadsafe(self._publish, kind, data)
+            return
+        self._publish(kind, data)
+
+    def _publish(self, kind, data):
+        event = self._event(kind, data)
+        self._history.append(event)
+        increment("stream_events_total", type=kind)
+
+        for subscriber in self._subscribers:
+            try:
+                subscriber.queue.put_nowait(event)
+            except asyncio.QueueFull:
+             # Too slow to keep up: drop its backlog and tell it to re-fetch
+                while not subscriber.queue.empty():
+                    subscriber.queue.get_nowait()
+                subscriber.queue.put_nowait(self._resync())
+                increment("stream_resyncs_total", reason="overflow")
+
+    def subscribe(self, last_event_id: Optional[str] = None) -> Subscriber:
+        """Register a client, replaying whatever it missed since last_event_id"""
+        self._loop = asyncio.get_running_loop()
+        subscriber = Subscriber(self.buffer)
+        self._subscribers.add(subscriber)
+
+        if last_event_id:
+            epoch, _, sequence = last_event_id.partition("-")
+            oldest = self._history[0]["seq"] if self._history else self._sequence + 1
+            if epoch != self.epoch or not sequence.isdigit() or int(sequence) + 1 < oldest:
+                subscriber.queue.put_nowait(self._resync())
+                increment("stream_resyncs_total", reason="resume")
+            else:
+                missed = [event for event in self._history if event["seq"] > int(sequence)]
+                if len(missed) >= self.buffer:
+                    subscriber.queue.put_nowait(self._resync())
+                    increment("stream_resyncs_total", reason="resume")
+                else:
+                    for event in missed:
+                        subscriber.queue.put_nowait(event)
+
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        self._subscribers.discard(subscriber)
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subscribers)
+
+
+def format_sse(event) -> str:
+    """Render one event in the text/event-stream wire format"""
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {dumps(event['data']).decode('utf-8')}\n\n"
+
+
+async def event_stream(broker: EventBroker, subscriber: Subscriber, request):
+    """Yield SSE frames for one subscriber until the client disconnects"""
+    try:
+        yield "retry: 3000\n\n"
+        while not await request.is_disconnected():
+            try:
+                event = await asyncio.wait_for(subscriber.queue.get(), timeout=HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            yield format_sse(event)
+    finally:
+        broker.unsubscribe(subscriber)
+
+
+# The broker shared by every endpoint in this process
+broker = EventBroker()
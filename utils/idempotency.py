@@ -0,0 +1,217 @@
+import os, time, uuid, asyncio, hashlib, sqlite3, threading
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+from fastapi import HTTPException, Request
+from fastapi.encoders import jsonable_encoder
+from utils.cache import PATH as CACHE_PATH
+from utils.metrics import increment
+from utils.serialization import dumps, loads, json_response
+
+# How long a finished response is replayed for, how many are kept, and how long a retry waits on the original
+TTL_SECONDS = float(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+MAX_ENTRIES = int(os.getenv("IDEMPOTENCY_MAX_ENTRIES", "10000"))
+WAIT_SECONDS = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", "30"))
+POLL_SECONDS = 0.05
+
+# A running request holds its key on a lease it renews every LEASE_SECONDS / 3; the lease only runs out
+# (letting a retry take over) when the worker running it died
+LEASE_SECONDS = float(os.getenv("IDEMPOTENCY_LEASE_SECONDS", "30"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS idempotency (
+    key TEXT PRIMARY KEY, fingerprint TEXT, state TEXT, status INTEGER, body BLOB,
+    created_at REAL, expires_at REAL, owner TEXT
+);
+CREATE INDEX IF NOT EXISTS idempotency_expires ON idempotency (expires_at);
+"""
+
+
+# Set by run() for the pipeline it wraps: a one-item list (so worker threads, which get a copy of the context, share it)
+_written: ContextVar[Optional[list]] = ContextVar("idempotency_written", default=None)
+
+
+def mark_written():
+    """
+    Call right after a keyed pipeline's first write: from then on a failure is stored and replayed to
+    retries like a success, instead of releasing the key for a retry that would write again
+    """
+    written = _written.get()
+    if written is not None:
+        written[0] = True
+
+
+def fingerprint(request: Request, body: bytes = b"") -> str:
+    """What a key is bound to: reusing it for a different method, path or body is an error"""
+    return hashlib.sha256(f"{request.method} {request.url.path}\n".encode() + body).hexdigest()
+
+
+class IdempotencyStore:
+    """
+    Idempotency-Key support for non-idempotent endpoints.
+
+    The first request with a key claims it and runs; its successful response is stored for TTL
+    seconds and replayed to every later request with that key. A retry that arrives while the
+    original is still running waits for it instead of running the pipeline again. A request that
+    fails before its first write (see mark_written) releases the key so that it can be retried; one
+    that fails after it stores and replays its error. Entries live in the shared cache file, so a
+    retry that lands on another worker is deduplicated too.
+
+    Each claim carries an owner token: only the request that made it can renew, finish or release
+    it, so an original that outlives its lease can't overwrite or delete a retry's claim.
+    """
+
+    def __init__(self, path: str = CACHE_PATH, ttl: float = TTL_SECONDS, max_entries: int = MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._claims = 0
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.executescript(SCHEMA)
+         # Files created before claims had owners
+            columns = [row[1] for row in self._db.execute("PRAGMA table_info(idempotency)")]
+            if "owner" not in columns:
+                self._db.execute("ALTER TABLE idempotency ADD COLUMN owner TEXT")
+        return self._db
+
+    def _claim(self, key: str, fingerprint: str, owner: str) -> Optional[tuple]:
+        """Take the key (new, expired, or abandoned by a crashed request); otherwise return its row"""
+        now = time.time()
+        with self._lock:
+            db = self._connect()
+            claimed = db.execute(
+                "INSERT INTO idempotency (key, fingerprint, state, created_at, expires_at, owner) "
+                "VALUES (?, ?, 'pending', ?, ?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET fingerprint = excluded.fingerprint, state = 'pending', status = NULL, "
+                "body = NULL, created_at = excluded.created_at, expires_at = excluded.expires_at, owner = excluded.owner "
+                "WHERE idempotency.expires_at < ?",
+                (key, fingerprint, now, now + LEASE_SECONDS, owner, now)
+            ).rowcount
+            if claimed:
+                self._claims += 1
+                if self._claims % 100 == 0:
+                    self._evict(db, now)
+                return None
+            return db.execute(
+                "SELECT state, fingerprint, status, body FROM idempotency WHERE key = ?", (key,)
+            ).fetchone()
+
+    def _evict(self, db, now):
+        db.execute("DELETE FROM idempotency WHERE expires_at < ?", (now,))
+        excess = db.execute("SELECT COUNT(*) FROM idempotency").fetchone()[0] - self.max_entries
+        if excess > 0:
+            db.execute(
+                "DELETE FROM idempotency WHERE key IN "
+                "(SELECT key FROM idempotency WHERE state = 'done' ORDER BY created_at LIMIT ?)", (excess,)
+            )
+
+    def _renew(self, key: str, owner: str) -> bool:
+        with self._lock:
+            return bool(self._connect().execute(
+                "UPDATE idempotency SET expires_at = ? WHERE key = ? AND owner = ? AND state = 'pending'",
+                (time.time() + LEASE_SECONDS, key, owner)
+            ).rowcount)
+
+    async def _keep_alive(self, key: str, owner: str):
+        """Renew the lease until cancelled (the request finished) or lost"""
+        while True:
+            await asyncio.sleep(LEASE_SECONDS / 3)
+            if not self._renew(key, owner):
+                print(f"[ERROR] - Lost the Idempotency-Key lease on {key}")
+                return
+
+    def _finish(self, key: str, owner: str, status: int, body: bytes):
+        with self._lock:
+            self._connect().execute(
+                "UPDATE idempotency SET state = 'done', status = ?, body = ?, expires_at = ? WHERE key = ? AND owner = ?",
+                (status, body, time.time() + self.ttl, key, owner)
+            )
+
+    def _release(self, key: str, owner: str):
+        with self._lock:
+            self._connect().execute(
+                "DELETE FROM idempotency WHERE key = ? AND owner = ? AND state = 'pending'", (key, owner)
+            )
+
+    async def run(self, key: Optional[str], fingerprint: str, func: Callable, *args, **kwargs) -> Any:
+        """
+        await func(*args, **kwargs) at most once per Idempotency-Key (no key: just run it)
+
+        :return result: func's result, or a JSON response replaying the stored result of an earlier request
+        """
+        if not key:
+            return await func(*args, **kwargs)
+        if len(key) > 255:
+            raise HTTPException(status_code=400, detail="Idempotency-Key must be at most 255 characters")
+
+        owner = uuid.uuid4().hex
+        deadline = time.time() + WAIT_SECONDS
+        waited = False
+        while True:
+            row = self._claim(key, fingerprint, owner)
+            if row is None:
+                break
+
+            state, stored_fingerprint, status, body = row
+            if stored_fingerprint != fingerprint:
+                increment("idempotency_requests_total", result="mismatch")
+                raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different request")
+            if state == "done":
+                increment("idempotency_requests_total", result="replayed")
+                return json_response(loads(body), status_code=status, headers={"Idempotent-Replayed": "true"})
+
+         # The original is still running: wait for it (directly if it is in this worker), then look again
+            if time.time() >= deadline:
+                increment("idempotency_requests_total", result="conflict")
+                raise HTTPException(
+                    status_code=409,
+                    detail="A request with this Idempotency-Key is still in progress",
+                    headers={"Retry-After": "1"}
+                )
+            if not waited:
+                waited = True
+                increment("idempotency_requests_total", result="waited")
+            original = self._inflight.get(key)
+            if original is not None:
+                await asyncio.wait([original], timeout=deadline - time.time())
+            else:
+                await asyncio.sleep(POLL_SECONDS)
+
+        increment("idempotency_requests_total", result="new")
+        done = self._inflight[key] = asyncio.get_running_loop().create_future()
+        lease = asyncio.create_task(self._keep_alive(key, owner))
+        written = [False]
+        token = _written.set(written)
+        try:
+            result = await func(*args, **kwargs)
+            self._finish(key, owner, 200, dumps(jsonable_encoder(result)))
+            return result
+        except BaseException as e:
+            if not written[0]:
+                self._release(key, owner)
+                raise
+         # Part of the work is already in the database: a retry gets this error back instead of redoing it
+            if isinstance(e, HTTPException):
+                self._finish(key, owner, e.status_code, dumps({"detail": e.detail}))
+            else:
+                self._finish(key, owner, 500, dumps({"detail": "Internal Server Error"}))
+            increment("idempotency_requests_total", result="failed_after_write")
+            raise
+        finally:
+            _written.reset(token)
+            lease.cancel()
+            if self._inflight.get(key) is done:
+                del self._inflight[key]
+            done.set_result(None)
+
+
+# The store shared by every endpoint in this process (and, through the file, every worker)
+store = IdempotencyStore()
@@ -0,0 +1,251 @@
+import os, time, inspect, functools, threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional, Tuple
+
+# Latency buckets (seconds) for the per-route histogram, and call-count buckets for fan-out per request
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+CALL_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100, 250)
+
+# Opt-in slow request log: print the external call breakdown of any request slower than this
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "0") or 0)
+
+_lock = threading.Lock()
+
+# External calls made while serving the current request: service -> [calls, seconds]
+_request_calls: ContextVar[Optional[Dict[str, list]]] = ContextVar("request_calls", default=None)
+
+
+class Histogram:
+    """Cumulative Prometheus-style histogram"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.total += value
+        self.count += 1
+
+
+_route_latency: Dict[Tuple[str, str, str], Histogram] = {}
+_route_calls: Dict[Tuple[str, str], Histogram] = {}
+_external_calls: Dict[Tuple[str, str], list] = {}
+_counters: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], int] = {}
+
+
+def increment(name, amount=1, **labels):
+    """Bump a free-form counter (rendered as <name>{labels} on /metrics)"""
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+def record_call(service, operation, seconds, error=False):
+    """Count one external call globally and against the request that made it"""
+    with _lock:
+        stats = _external_calls.setdefault((service, operation), [0, 0.0, 0])
+        stats[0] += 1
+        stats[1] += seconds
+        stats[2] += 1 if error else 0
+
+    calls = _request_calls.get()
+    if calls is not None:
+        entry = calls.setdefault(service, [0, 0.0])
+        entry[0] += 1
+        entry[1] += seconds
+
+
+@contextmanager
+def track(service, operation):
+    """Time the wrapped block as one call to an external service"""
+    start = time.perf_counter()
+    error = False
+    try:
+        yield
+    except Exception:
+        error = True
+        raise
+    finally:
+        record_call(service, operation, time.perf_counter() - start, error)
+
+
+def instrumented(service, operation=None):
+    """
+    Decorator counting/timing every call of a (sync or async) function as an external call
+
+    :param service: The upstream being called (supabase, anthropic, gist, ...)
+    :param operation: Name of the operation, defaults to the function name
+    """
+    def decorator(func):
+        name = operation or func.__name__
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with track(service, name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with track(service, name):
+                return func(*args, **kwargs)
+        return wrapper
+
+    return decorator
+
+
+class _InstrumentedQuery:
+    """Wraps a postgrest query builder so that .execute() is timed as one Supabase round trip"""
+
+    VERBS = ("select", "insert", "update", "upsert", "delete")
+
+    def __init__(self, builder, table, verb="query"):
+        self._builder = builder
+        self._table = table
+        self._verb = verb
+
+    def __getattr__(self, name):
+        attr = getattr(self._builder, name)
+        if not callable(attr):
+            return attr
+
+        def chained(*args, **kwargs):
+            result = attr(*args, **kwargs)
+            if hasattr(result, "execute"):
+                verb = name if name in self.VERBS else self._verb
+                return _InstrumentedQuery(result, self._table, verb)
+            return result
+        return chained
+
+    def execute(self):
+        with track("supabase", f"{self._table}.{self._verb}"):
+            return self._builder.execute()
+
+
+class _InstrumentedClient:
+    """Thin proxy over a supabase Client which instruments every table() query"""
+
+    def __init__(self, client):
+        self._client = client
+
+    def table(self, name):
+        return _InstrumentedQuery(self._client.table(name), name)
+
+    def rpc(self, name, params=None):
+        return _InstrumentedQuery(self._client.rpc(name, params or {}), name, "rpc")
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+
+def instrument_client(client):
+    """Wrap a supabase Client so that its queries show up in /metrics and the slow request log"""
+    return _InstrumentedClient(client)
+
+
+async def metrics_middleware(request, call_next):
+    """HTTP middleware recording per-route latency and the external calls each request made"""
+    calls: Dict[str, list] = {}
+    token = _request_calls.set(calls)
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+    finally:
+        elapsed = time.perf_counter() - start
+        _request_calls.reset(token)
+
+     # Use the route template (/api/tasks/{task_id}) so that ids don't explode the label set
+        route = request.scope.get("route")
+        path = getattr(route, "path", "unmatched")
+        total_calls = sum(entry[0] for entry in calls.values())
+
+        with _lock:
+            _route_latency.setdefault((request.method, path, str(status)), Histogram(LATENCY_BUCKETS)).observe(elapsed)
+            _route_calls.setdefault((request.method, path), Histogram(CALL_BUCKETS)).observe(total_calls)
+
+        if SLOW_REQUEST_MS and elapsed * 1000 >= SLOW_REQUEST_MS:
+            breakdown = ", ".join(
+                f"{service}: {entry[0]} calls / {entry[1] * 1000:.1f}ms" for service, entry in sorted(calls.items())
+            ) or "no external calls"
+            print(f"[SLOW] - {request.method} {path} took {elapsed * 1000:.1f}ms ({breakdown})")
+
+    response.headers["Server-Timing"] = ", ".join(
+        [f'{service};dur={entry[1] * 1000:.1f};desc="{entry[0]} calls"' for service, entry in sorted(calls.items())]
+        + [f"total;dur={elapsed * 1000:.1f}"]
+    )
+    return response
+
+
+def _labels(**labels):
+    return ",".join(f'{key}="{value}"' for key, value in labels.items())
+
+
+def _render_histogram(lines, name, histogram, labels):
+    for bound, count in zip(histogram.buckets, histogram.counts):
+        lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {count}')
+    lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+    lines.append(f"{name}_sum{{{labels}}} {histogram.total}")
+    lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+
+
+def render_prometheus() -> str:
+    """Render every metric in the Prometheus text exposition format"""
+    lines = []
+    with _lock:
+        lines.append("# HELP http_request_duration_seconds Request latency per route")
+        lines.append("# TYPE http_request_duration_seconds histogram")
+        for (method, path, status), histogram in sorted(_route_latency.items()):
+            _render_histogram(lines, "http_request_duration_seconds", histogram,
+                              _labels(method=method, route=path, status=status))
+
+        lines.append("# HELP http_request_external_calls External calls made by a single request per route")
+        lines.append("# TYPE http_request_external_calls histogram")
+        for (method, path), histogram in sorted(_route_calls.items()):
+            _render_histogram(lines, "http_request_external_calls", histogram, _labels(method=method, route=path))
+
+        lines.append("# HELP external_calls_total Calls made to external services")
+        lines.append("# TYPE external_calls_total counter")
+        for (service, operation), stats in sorted(_external_calls.items()):
+            lines.append(f"external_calls_total{{{_labels(service=service, operation=operation)}}} {stats[0]}")
+
+        lines.append("# HELP external_call_errors_total Calls to external services that raised")
+        lines.append("# TYPE external_call_errors_total counter")
+        for (service, operation), stats in sorted(_external_calls.items()):
+            lines.append(f"external_call_errors_total{{{_labels(service=service, operation=operation)}}} {stats[2]}")
+
+        lines.append("# HELP external_call_seconds_total Time spent waiting on external services")
+        lines.append("# TYPE external_call_seconds_total counter")
+        for (service, operation), stats in sorted(_external_calls.items()):
+            lines.append(f"external_call_seconds_total{{{_labels(service=service, operation=operation)}}} {stats[1]}")
+
+        for name in sorted({name for name, _ in _counters}):
+            lines.append(f"# TYPE {name} counter")
+            for (counter, labels), value in sorted(_counters.items()):
+                if counter == name:
+                    lines.append(f"{name}{{{_labels(**dict(labels))}}} {value}")
+
+    return "\n".join(lines) + "\n"
+
+
+def snapshot() -> Dict[str, list]:
+    """Copy of the external call counters: "service.operation" -> [calls, seconds, errors]"""
+    with _lock:
+        return {f"{service}.{operation}": list(stats) for (service, operation), stats in _external_calls.items()}
+
+
+def reset():
+    """Forget every recorded metric"""
+    with _lock:
+        _route_latency.clear()
+        _route_calls.clear()
+        _external_calls.clear()
+        _counters.clear()
@@ -0,0 +1,288 @@
+import os, hmac, time, random, asyncio, cProfile, pstats, itertools, sysconfig, threading
+from collections import Counter, deque
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+from utils.metrics import increment
+
+# pyinstrument is optional: it samples (cheaper) and attributes async awaits exactly; cProfile (stdlib) otherwise
+try:
+    from pyinstrument import Profiler as Pyinstrument
+except ImportError:
+    Pyinstrument = None
+
+# Profile a request when it carries "X-Profile: <PROFILE_TOKEN>", or at random for PROFILE_SAMPLE_RATE of requests
+TOKEN = os.getenv("PROFILE_TOKEN", "")
+SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0") or 0)
+BUFFER_SIZE = int(os.getenv("PROFILE_BUFFER_SIZE", "50"))
+INTERVAL = float(os.getenv("PROFILE_INTERVAL", "0.001"))
+ENGINE = os.getenv("PROFILE_ENGINE", "auto")
+
+# With neither set the middleware isn't installed at all
+enabled = bool(TOKEN) or SAMPLE_RATE > 0
+
+HEADER = "x-profile"
+SKIP_PREFIXES = ("/metrics", "/api/profiles")
+MAX_DEPTH = 200
+STDLIB = sysconfig.get_paths()["stdlib"] + os.sep
+
+_capture: ContextVar[Optional["Capture"]] = ContextVar("profile_capture", default=None)
+_active = False
+
+# cProfile can't run twice at once (on 3.12+ that raises "Another profiling tool is already active")
+_cprofile_lock = threading.Lock()
+
+
+def engine() -> str:
+    """The profiler in use: PROFILE_ENGINE, or pyinstrument when it is installed"""
+    if ENGINE == "cprofile" or Pyinstrument is None:
+        return "cprofile"
+    return "pyinstrument"
+
+
+def _short(path: str) -> str:
+    """Trim a source path to something readable in a flamegraph"""
+    if "site-packages" in path:
+        return path.split("site-packages" + os.sep, 1)[-1]
+    if path.startswith(STDLIB):
+        return path[len(STDLIB):]
+    cwd = os.getcwd() + os.sep
+    return path[len(cwd):] if path.startswith(cwd) else path
+
+
+def _label(function: str, path: str, line) -> str:
+    label = function if path in ("~", "") else f"{function} ({_short(path)}:{line})"
+ # ";" separates frames in the collapsed format
+    return label.replace(";", ":")
+
+
+def _pyinstrument_stacks(session, root: str) -> Counter:
+    stacks = Counter()
+    for identifiers, seconds in session.frame_records:
+        frames = []
+        for identifier in identifiers:
+            function, path, line = (identifier.split("\x01")[0].split("\x00") + ["", ""])[:3]
+         # A worker thread's stack starts below Capture.run (the thread pool frames above it are noise)
+            if root and path == __file__:
+                frames = []
+            elif path != "<thread>":
+                frames.append(_label(function, path, line))
+        stacks[";".join(([root] if root else []) + frames)] += seconds
+    return stacks
+
+
+def _cprofile_stacks(profiler, root: str) -> Counter:
+    """
+    cProfile only records caller -> callee totals, so stacks are rebuilt by walking that graph from the
+    entry points and splitting a function's time between its callers in proportion to their calls
+    """
+    try:
+        stats = pstats.Stats(profiler).stats
+    except TypeError:  # nothing was called
+        return Counter()
+
+    callees: Dict[tuple, list] = {}
+    for func, (_, _, _, _, callers) in stats.items():
+        for caller, edge in callers.items():
+            callees.setdefault(caller, []).append((func, edge[3]))
+
+    stacks = Counter()
+
+    def walk(func, path, frames, share):
+        _, _, self_time, total_time, _ = stats[func]
+        if self_time * share > 0:
+            stacks[";".join(frames)] += self_time * share
+        if len(frames) >= MAX_DEPTH:
+            return
+        for callee, edge_time in callees.get(func, ()):
+            callee_total = stats[callee][3]
+            if callee in path or callee_total <= 0 or edge_time * share < 1e-6:
+                continue
+            walk(callee, path | {callee}, frames + [_label(callee[2], callee[0], callee[1])],
+                 share * edge_time / callee_total)
+
+    for func, (_, _, _, _, callers) in stats.items():
+        if not callers and func[0] != __file__:
+            walk(func, {func}, ([root] if root else []) + [_label(func[2], func[0], func[1])], 1.0)
+    return stacks
+
+
+class Capture:
+    """
+    The profile of one request: every call it hands to a worker thread through to_thread() below
+    (Supabase queries, skill tree builds, ...), plus, with pyinstrument, its code on the event loop.
+
+    cProfile doesn't profile the event loop: it would record every other request's coroutines too.
+    It also only runs in one thread at a time, so concurrent worker calls of the request past the
+    first one run unprofiled.
+    """
+
+    def __init__(self, engine: str):
+        self.engine = engine
+        self.stacks = Counter()
+        self._lock = threading.Lock()
+        self._profiler = None
+
+    def _start(self, async_mode: bool):
+        """A running profiler for this thread, or None when one can't be started right now"""
+        if self.engine == "pyinstrument":
+            profiler = Pyinstrument(interval=INTERVAL, async_mode="enabled" if async_mode else "disabled")
+            profiler.start()
+            return profiler
+
+        if not _cprofile_lock.acquire(blocking=False):
+            increment("profiles_skipped_total", reason="profiler_busy")
+            return None
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:  # another tool (a debugger, coverage) holds the profiling hook
+            _cprofile_lock.release()
+            increment("profiles_skipped_total", reason="profiler_busy")
+            return None
+        return profiler
+
+    def _stop(self, profiler, root: str):
+        if self.engine == "pyinstrument":
+            stacks = _pyinstrument_stacks(profiler.stop(), root)
+        else:
+            profiler.disable()
+            _cprofile_lock.release()
+            stacks = _cprofile_stacks(profiler, root)
+        with self._lock:
+            self.stacks.update(stacks)
+
+    def start(self):
+        if self.engine == "pyinstrument":
+            self._profiler = self._start(async_mode=True)
+
+    def stop(self):
+        if self._profiler is not None:
+            self._stop(self._profiler, "")
+
+    def run(self, func: Callable, *args, **kwargs):
+        """Call func in this (worker) thread under a profiler of its own, adding its stacks to the request's"""
+        profiler = self._start(async_mode=False)
+        if profiler is None:
+            return func(*args, **kwargs)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            self._stop(profiler, "[worker thread]")
+
+
+async def to_thread(func: Callable, *args, **kwargs):
+    """asyncio.to_thread that carries the profile of the current request (if any) into the worker thread"""
+    capture = _capture.get()
+    if capture is None:
+        return await asyncio.to_thread(func, *args, **kwargs)
+    return await asyncio.to_thread(capture.run, func, *args, **kwargs)
+
+
+class ProfileBuffer:
+    """The last `size` request profiles, oldest dropped first"""
+
+    def __init__(self, size: int = BUFFER_SIZE):
+        self._profiles = deque(maxlen=size)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def add(self, **profile) -> int:
+        with self._lock:
+            profile["id"] = next(self._ids)
+            self._profiles.append(profile)
+        return profile["id"]
+
+    def list(self) -> List[dict]:
+        """Every stored profile without its stacks, newest first"""
+        with self._lock:
+            return [{k: v for k, v in profile.items() if k != "stacks"} for profile in reversed(self._profiles)]
+
+    def get(self, profile_id: int) -> Optional[dict]:
+        with self._lock:
+            return next((profile for profile in self._profiles if profile["id"] == profile_id), None)
+
+    def merged(self, route: Optional[str] = None) -> Counter:
+        """The stacks of every stored profile (of one route template) added together"""
+        stacks = Counter()
+        with self._lock:
+            for profile in self._profiles:
+                if route is None or profile["route"] == route:
+                    stacks.update(profile["stacks"])
+        return stacks
+
+    def clear(self):
+        with self._lock:
+            self._profiles.clear()
+
+
+def collapsed(stacks: Counter) -> str:
+    """Brendan Gregg's collapsed stack format (flamegraph.pl, speedscope, inferno), weighted in microseconds"""
+    lines = []
+    for stack, seconds in sorted(stacks.items()):
+        weight = round(seconds * 1e6)
+        if weight > 0:
+            lines.append(f"{stack} {weight}")
+    return "\n".join(lines) + "\n"
+
+
+def _trigger(request) -> Optional[str]:
+    if request.url.path.startswith(SKIP_PREFIXES):
+        return None
+    header = request.headers.get(HEADER)
+    if TOKEN and header and hmac.compare_digest(header, TOKEN):
+        return "header"
+    if SAMPLE_RATE and random.random() < SAMPLE_RATE:
+        return "sample"
+    return None
+
+
+async def profiling_middleware(request, call_next):
+    """HTTP middleware profiling requests that carry the admin header, and a SAMPLE_RATE share of the rest"""
+    global _active
+    trigger = _trigger(request)
+    if trigger is None:
+        return await call_next(request)
+
+ # Event loop profilers can't overlap: one request at a time per worker
+    if _active:
+        increment("profiles_skipped_total", reason="busy")
+        return await call_next(request)
+
+    _active = True
+    capture = Capture(engine())
+    token = _capture.set(capture)
+    started_at = datetime.now(timezone.utc)
+    start = time.perf_counter()
+    status = 500
+    capture.start()
+    try:
+        response = await call_next(request)
+        status = response.status_code
+    finally:
+        capture.stop()
+        elapsed = time.perf_counter() - start
+        _capture.reset(token)
+        _active = False
+
+        route = request.scope.get("route")
+        profile_id = profiles.add(
+            method=request.method,
+            route=getattr(route, "path", "unmatched"),
+            path=request.url.path,
+            status=status,
+            trigger=trigger,
+            engine=capture.engine,
+            pid=os.getpid(),
+            started_at=started_at.isoformat(),
+            duration_ms=round(elapsed * 1000, 1),
+            stacks=capture.stacks
+        )
+        increment("profiles_captured_total", trigger=trigger)
+
+    response.headers["X-Profile-Id"] = str(profile_id)
+    return response
+
+
+# The profiles captured by this process
+profiles = ProfileBuffer()
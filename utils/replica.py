@@ -0,0 +1,295 @@
+import os, time, sqlite3, threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from utils.clients import get_supabase
+
+# Optional local read replica: READ_REPLICA=1 mirrors the tables below into an indexed SQLite file.
+# Reads are served from it, writes still go to Supabase (and are written through to the mirror).
+ENABLED = os.getenv("READ_REPLICA", "0") not in ("", "0")
+PATH = os.getenv("REPLICA_PATH", str(Path(__file__).parent.parent / "data" / "replica.sqlite3"))
+SYNC_SECONDS = float(os.getenv("REPLICA_SYNC_SECONDS", "30"))
+PAGE_SIZE = 1000
+
+# table -> (columns, boolean columns, incremental cursor column)
+TABLES: Dict[str, Tuple[Tuple[str, ...], Tuple[str, ...], str]] = {
+    "tasks": (
+        ("id", "title", "description", "category", "priority", "due_date", "is_recurring",
+         "recurrence_pattern", "is_active", "created_at", "updated_at"),
+        ("is_recurring", "is_active"),
+        "updated_at"
+    ),
+    "tags": (("id", "name", "parent_tag_id", "category"), (), "id"),
+    "task_tags": (("id", "task_id", "tag_id"), (), "id"),
+    "task_completions": (
+        ("id", "task_id", "completed_at", "completion_quality", "notes", "was_late",
+         "time_spent_minutes", "points"),
+        ("was_late",),
+        "id"
+    ),
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY, title TEXT, description TEXT, category TEXT, priority INTEGER,
+    due_date TEXT, is_recurring INTEGER, recurrence_pattern TEXT, is_active INTEGER,
+    created_at TEXT, updated_at TEXT
+);
+CREATE TABLE IF NOT EXISTS tags (id INTEGER PRIMARY KEY, name TEXT, parent_tag_id INTEGER, category TEXT);
+CREATE TABLE IF NOT EXISTS task_tags (id INTEGER PRIMARY KEY, task_id INTEGER, tag_id INTEGER);
+CREATE TABLE IF NOT EXISTS task_completions (
+    id INTEGER PRIMARY KEY, task_id INTEGER, completed_at TEXT, completion_quality INTEGER,
+    notes TEXT, was_late INTEGER, time_spent_minutes INTEGER, points INTEGER
+);
+CREATE TABLE IF NOT EXISTS sync_state (name TEXT PRIMARY KEY, value TEXT);
+CREATE INDEX IF NOT EXISTS tasks_active ON tasks (is_active);
+CREATE INDEX IF NOT EXISTS tasks_updated ON tasks (updated_at);
+CREATE INDEX IF NOT EXISTS tags_parent ON tags (parent_tag_id);
+CREATE INDEX IF NOT EXISTS task_tags_task ON task_tags (task_id);
+CREATE INDEX IF NOT EXISTS task_tags_tag ON task_tags (tag_id);
+CREATE INDEX IF NOT EXISTS completions_completed ON task_completions (completed_at);
+CREATE INDEX IF NOT EXISTS completions_task ON task_completions (task_id);
+"""
+
+
+class Replica:
+    """
+    SQLite mirror of tasks, tags, task_tags and task_completions.
+
+    load() pages every table in once; sync() then pulls only rows past each table's cursor
+    (tasks by (updated_at, id), the rest by id). Writes made through this API are applied directly
+    with apply() / delete_task(), so they show up before the next sync.
+    """
+
+    def __init__(self, path: str = PATH, enabled: bool = ENABLED):
+        self.path = path
+        self.enabled = enabled
+        self.last_sync: Optional[float] = None
+        self._lock = threading.RLock()
+        self._reload_lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+     # Tables being rebuilt by reload(): writes go to their staging copy too, so the swap keeps them
+        self._staging: set = set()
+
+    @property
+    def ready(self) -> bool:
+        """Serve reads from the mirror only once it has been loaded at least once"""
+        return self.enabled and self.last_sync is not None
+
+    def lag(self) -> float:
+        """Seconds since the mirror last caught up with Supabase"""
+        return time.time() - self.last_sync if self.last_sync else float("inf")
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            self._db.row_factory = sqlite3.Row
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.executescript(SCHEMA)
+        return self._db
+
+    # State
+    def _state(self, name) -> Optional[str]:
+        with self._lock:
+            row = self._connect().execute("SELECT value FROM sync_state WHERE name = ?", (name,)).fetchone()
+        return row["value"] if row else None
+
+    def _set_state(self, name, value):
+        with self._lock:
+            self._connect().execute("INSERT OR REPLACE INTO sync_state (name, value) VALUES (?, ?)", (name, str(value)))
+
+    # Writes
+    def _upsert(self, table, rows: List[dict], into: Optional[str] = None):
+        columns, booleans, _ = TABLES[table]
+        values = [
+            tuple(int(row[c]) if c in booleans and row.get(c) is not None else row.get(c) for c in columns)
+            for row in rows
+        ]
+        self._connect().executemany(
+            f"INSERT OR REPLACE INTO {into or table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+            values
+        )
+
+    def _targets(self, table) -> List[str]:
+        return [table, f"{table}_staging"] if table in self._staging else [table]
+
+    def apply(self, table, rows: List[dict]):
+        """Write rows returned by a Supabase insert/update straight into the mirror"""
+        if not self.ready or not rows:
+            return
+        with self._lock:
+            for target in self._targets(table):
+                self._upsert(table, rows, into=target)
+
+    def delete(self, table, column, value):
+        if not self.ready:
+            return
+        with self._lock:
+            for target in self._targets(table):
+                self._connect().execute(f"DELETE FROM {target} WHERE {column} = ?", (value,))
+
+    def delete_task(self, task_id):
+        """Mirror a hard delete: the task plus its completions and tag links"""
+        if not self.ready:
+            return
+        with self._lock:
+            db = self._connect()
+            db.execute("BEGIN")
+            for table, column in (("task_completions", "task_id"), ("task_tags", "task_id"), ("tasks", "id")):
+                for target in self._targets(table):
+                    db.execute(f"DELETE FROM {target} WHERE {column} = ?", (task_id,))
+            db.execute("COMMIT")
+
+    # Sync
+    def _store(self, table, page: List[dict], into: Optional[str] = None):
+        if page:
+            with self._lock:
+                db = self._connect()
+                db.execute("BEGIN")
+                self._upsert(table, page, into=into)
+                db.execute("COMMIT")
+
+    def _pull(self, table, since: Optional[str], into: Optional[str] = None) -> Tuple[int, Optional[str]]:
+        """
+        Page rows past the cursor (keyset pagination) out of Supabase into the mirror (or the `into` table);
+        returns (rows, new cursor)
+        """
+        columns, _, cursor = TABLES[table]
+        select = ", ".join(columns)
+        pulled = 0
+
+        if cursor == "id":
+            while True:
+                query = get_supabase().table(table).select(select)
+                if since is not None:
+                    query = query.gt('id', int(since))
+                page = query.order('id').limit(PAGE_SIZE).execute().data
+                self._store(table, page, into)
+                pulled += len(page)
+                if page:
+                    since = str(page[-1]['id'])
+                if len(page) < PAGE_SIZE:
+                    return pulled, since
+
+     # updated_at isn't unique (a multi-row insert stamps every row with the same now()), so the cursor is
+      # "<updated_at>|<id>": finish the rows tied with the cursor's timestamp by id, then move past it
+        value, last_id = (since.rsplit("|", 1) + [None])[:2] if since else (None, None)
+        while True:
+            if value is not None:
+                query = get_supabase().table(table).select(select).eq(cursor, value)
+                if last_id:
+                    query = query.gt('id', int(last_id))
+                page = query.order('id').limit(PAGE_SIZE).execute().data
+                self._store(table, page, into)
+                pulled += len(page)
+                if page:
+                    last_id = str(page[-1]['id'])
+                if len(page) == PAGE_SIZE:
+                    continue
+
+            query = get_supabase().table(table).select(select)
+            if value is not None:
+                query = query.gt(cursor, value)
+            page = query.order(cursor).order('id').limit(PAGE_SIZE).execute().data
+            self._store(table, page, into)
+            pulled += len(page)
+            if page:
+                value, last_id = page[-1][cursor], str(page[-1]['id'])
+            if len(page) < PAGE_SIZE:
+                return pulled, None if value is None else f"{value}|{last_id}"
+
+    def reload(self, *tables):
+        """
+        Re-mirror whole tables (after bulk deletes the cursors can't see). Each one is pulled into a staging
+        copy while reads keep using the old one, then all of them are swapped in one transaction.
+        """
+        with self._reload_lock:
+            cursors = {}
+            try:
+                with self._lock:
+                    db = self._connect()
+                    for table in tables:
+                        columns = TABLES[table][0]
+                        db.execute(f"DROP TABLE IF EXISTS {table}_staging")
+                        db.execute(f"CREATE TABLE {table}_staging "
+                                   f"({', '.join(c + ' INTEGER PRIMARY KEY' if c == 'id' else c for c in columns)})")
+                        self._staging.add(table)
+
+                for table in tables:
+                    _, cursors[table] = self._pull(table, None, into=f"{table}_staging")
+
+                with self._lock:
+                    db.execute("BEGIN")
+                    for table in tables:
+                        columns = ", ".join(TABLES[table][0])
+                        db.execute(f"DELETE FROM {table}")
+                        db.execute(f"INSERT INTO {table} ({columns}) SELECT {columns} FROM {table}_staging")
+                        self._set_state(f"cursor:{table}", cursors[table] or "")
+                    db.execute("COMMIT")
+            finally:
+                with self._lock:
+                    if self._db is not None and self._db.in_transaction:
+                        self._db.execute("ROLLBACK")
+                    for table in tables:
+                        self._staging.discard(table)
+                        self._connect().execute(f"DROP TABLE IF EXISTS {table}_staging")
+        self.sync()
+
+    def sync(self) -> Dict[str, int]:
+        """Pull everything changed since the last sync (a full load the first time)"""
+        started = time.time()
+        pulled = {}
+        for table in TABLES:
+            since = self._state(f"cursor:{table}") or None
+            pulled[table], cursor = self._pull(table, since)
+            if cursor is not None:
+                self._set_state(f"cursor:{table}", cursor)
+
+        self.last_sync = started
+        return pulled
+
+    def load(self) -> Dict[str, int]:
+        """Open the mirror and catch it up; a mirror file left by a previous run only pulls the delta"""
+        return self.sync()
+
+    # Reads
+    def _query(self, sql, params=()) -> List[sqlite3.Row]:
+        with self._lock:
+            return self._connect().execute(sql, params).fetchall()
+
+    def active_tasks(self) -> List[dict]:
+        return [self._task(row) for row in self._query("SELECT * FROM tasks WHERE is_active = 1")]
+
+    def _task(self, row) -> dict:
+        task = dict(row)
+        task["is_recurring"] = bool(task["is_recurring"])
+        task["is_active"] = bool(task["is_active"])
+        return task
+
+    def completions(self, limit: int, offset: int) -> List[dict]:
+        """Completions joined to their task, newest first (the /api/completed shape)"""
+        rows = self._query("""
+            SELECT c.id, c.task_id, t.title AS task_title, t.category AS task_category, c.completed_at,
+                   c.notes, c.was_late, c.time_spent_minutes, c.points
+            FROM task_completions c JOIN tasks t ON t.id = c.task_id
+            ORDER BY c.completed_at DESC LIMIT ? OFFSET ?
+        """, (limit, offset))
+        return [{**dict(row), "was_late": bool(row["was_late"])} for row in rows]
+
+    def tags(self) -> List[dict]:
+        return [dict(row) for row in self._query("SELECT * FROM tags")]
+
+    def completion_counts(self) -> Tuple[Dict[int, int], int]:
+        """Completions per tag id (one per tag of the completed task) and the total number of completions"""
+        counts = {row["tag_id"]: row["n"] for row in self._query("""
+            SELECT tt.tag_id, COUNT(*) AS n
+            FROM task_completions c JOIN task_tags tt ON tt.task_id = c.task_id
+            GROUP BY tt.tag_id
+        """)}
+        total = self._query("SELECT COUNT(*) AS n FROM task_completions")[0]["n"]
+        return counts, total
+
+
+# The mirror shared by every endpoint in this process
+replica = Replica()
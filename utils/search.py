@@ -0,0 +1,294 @@
+import re, math, time, heapq, bisect, threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from utils.clients import select_all
+from utils.tags import tag_paths_by_id
+
+TOKEN = re.compile(r"[a-z0-9]+")
+STOPWORDS = {"a", "an", "and", "the", "of", "to", "in", "on", "for", "with", "at", "by", "is", "it", "or"}
+
+# How many vocabulary terms one query prefix may expand to, and how much a prefix hit counts vs an exact one
+MAX_EXPANSIONS = 50
+PREFIX_WEIGHT = 0.7
+
+DocKey = Tuple[str, int]  # ("task", id) or ("completion", id)
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Lowercase alphanumeric tokens without stopwords"""
+    if not text:
+        return []
+    return [token for token in TOKEN.findall(text.lower()) if token not in STOPWORDS]
+
+
+class SearchIndex:
+    """
+    Inverted index over task titles/descriptions and completion notes with BM25 ranking
+    and prefix matching. Bulk built once, then kept current by the write endpoints.
+
+    Writes that arrive while a bulk load runs are applied and also queued: build() replaces the
+    index with the load's snapshot, which may predate them, so it replays the queue on top.
+    In multi-worker mode every write is also handed to `forward`, and the other workers apply
+    it with deliver(), so no worker has to rebuild its index from Supabase after another's write.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.ready = False
+        self.loading = False
+        self._pending: List[Tuple[str, tuple]] = []
+        self._relaying = False
+     # Set in multi-worker mode to hand every write to the other workers as well (see utils/cache.py)
+        self.forward: Optional[Callable[[str, Any], Any]] = None
+        self._postings: Dict[str, Dict[DocKey, int]] = {}
+        self._vocabulary: List[str] = []
+        self._docs: Dict[DocKey, dict] = {}
+        self._completions_by_task: Dict[int, set] = {}
+        self._total_length = 0
+        self._lock = threading.RLock()
+
+    # Writes
+    def _add(self, key: DocKey, text: str, meta: dict, bulk=False):
+        self._remove(key)
+        terms = {}
+        for token in tokenize(text):
+            terms[token] = terms.get(token, 0) + 1
+
+        for term, frequency in terms.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = {}
+                if not bulk:
+                    bisect.insort(self._vocabulary, term)
+            postings[key] = frequency
+
+        meta["length"] = sum(terms.values())
+        meta["terms"] = list(terms)
+        self._docs[key] = meta
+        self._total_length += meta["length"]
+
+    def _remove(self, key: DocKey):
+        meta = self._docs.pop(key, None)
+        if meta is None:
+            return
+        self._total_length -= meta["length"]
+        for term in meta["terms"]:
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(key, None)
+                if not postings:
+                    del self._postings[term]
+                    index = bisect.bisect_left(self._vocabulary, term)
+                    if index < len(self._vocabulary) and self._vocabulary[index] == term:
+                        self._vocabulary.pop(index)
+
+    @property
+    def tracking(self) -> bool:
+        """Whether writes should be passed in: the index is built or being built"""
+        return self.ready or self.loading
+
+    def _record(self, method: str, *args):
+        if self.loading:
+            self._pending.append((method, args))
+        if self.forward is not None and not self._relaying:
+            self.forward("search", (method, args))
+
+    def deliver(self, method: str, args: tuple):
+        """Apply a write relayed from another worker (without forwarding it again)"""
+        if method not in ("add_task", "update_task", "add_completion", "update_completion", "remove_task"):
+            return
+        with self._lock:
+            if not self.tracking:
+                return
+            self._relaying = True
+            try:
+                getattr(self, method)(*args)
+            finally:
+                self._relaying = False
+
+    def add_task(self, task: dict, tag_paths: Iterable[str] = ()):
+        with self._lock:
+            tag_paths = list(tag_paths)
+            self._record("add_task", task, tag_paths)
+            self._add_task(task, tag_paths)
+
+    def _add_task(self, task: dict, tag_paths: Iterable[str] = (), bulk=False):
+        with self._lock:
+            self._add(("task", task['id']), f"{task.get('title') or ''} {task.get('description') or ''}", {
+                "task_id": task['id'],
+                "title": task.get('title'),
+                "description": task.get('description'),
+                "category": task.get('category'),
+                "is_active": task.get('is_active', True),
+                "tag_paths": list(tag_paths)
+            }, bulk)
+
+    def update_task(self, task_id: int, fields: dict):
+        """Merge updated columns into an indexed task (and its completions' category)"""
+        with self._lock:
+            self._record("update_task", task_id, dict(fields))
+            current = self._docs.get(("task", task_id))
+            if current is None:
+                return
+            task = {"id": task_id, **{k: current[k] for k in ("title", "description", "category", "is_active")}}
+            task.update({k: v for k, v in fields.items() if k in task})
+            self._add_task(task, current["tag_paths"])
+
+            for completion_id in self._completions_by_task.get(task_id, ()):
+                completion = self._docs[("completion", completion_id)]
+                completion["title"] = task["title"]
+                completion["category"] = task["category"]
+
+    def add_completion(self, completion: dict, task: dict, tag_paths: Iterable[str] = ()):
+        with self._lock:
+            tag_paths = list(tag_paths)
+            self._record("add_completion", completion, task, tag_paths)
+            self._add_completion(completion, task, tag_paths)
+
+    def _add_completion(self, completion: dict, task: dict, tag_paths: Iterable[str] = (), bulk=False):
+        with self._lock:
+            self._add(("completion", completion['id']), completion.get('notes') or "", {
+                "task_id": completion['task_id'],
+                "title": task.get('title'),
+                "description": completion.get('notes'),
+                "category": task.get('category'),
+                "tag_paths": list(tag_paths)
+            }, bulk)
+            self._completions_by_task.setdefault(completion['task_id'], set()).add(completion['id'])
+
+    def update_completion(self, completion_id: int, notes: str):
+        with self._lock:
+            self._record("update_completion", completion_id, notes)
+            current = self._docs.get(("completion", completion_id))
+            if current is None:
+                return
+            self._add_completion({"id": completion_id, "task_id": current["task_id"], "notes": notes},
+                                {"title": current["title"], "category": current["category"]}, current["tag_paths"])
+
+    def remove_task(self, task_id: int):
+        """Drop a task and all of its completions"""
+        with self._lock:
+            self._record("remove_task", task_id)
+            self._remove(("task", task_id))
+            for completion_id in self._completions_by_task.pop(task_id, ()):
+                self._remove(("completion", completion_id))
+
+    # Bulk load
+    def build(self, tasks: List[dict], completions: List[dict], task_paths: Dict[int, List[str]]):
+        """Replace the whole index with the given rows"""
+        with self._lock:
+            self._postings.clear()
+            self._docs.clear()
+            self._completions_by_task.clear()
+            self._total_length = 0
+
+            by_id = {}
+            for task in tasks:
+                by_id[task['id']] = task
+                self._add_task(task, task_paths.get(task['id'], []), bulk=True)
+            for completion in completions:
+                task = by_id.get(completion['task_id'])
+                if task is not None:
+                    self._add_completion(completion, task, task_paths.get(task['id'], []), bulk=True)
+
+            self._vocabulary = sorted(self._postings)
+
+         # Writes made while the snapshot was being read
+            pending, self._pending, self.loading = self._pending, [], False
+            self._relaying = True
+            try:
+                for method, args in pending:
+                    getattr(self, method)(*args)
+            finally:
+                self._relaying = False
+            self.ready = True
+
+    def load(self) -> Dict[str, float]:
+        """Bulk build from Supabase: tasks, tag paths and completion notes, paged"""
+        start = time.perf_counter()
+        with self._lock:
+            self.loading = True
+            self._pending = []
+
+        try:
+            tasks = select_all('tasks', "id, title, description, category, is_active")
+            paths = tag_paths_by_id(select_all('tags'))
+            task_paths = {}
+            for link in select_all('task_tags', "task_id, tag_id"):
+                if link['tag_id'] in paths:
+                    task_paths.setdefault(link['task_id'], []).append(paths[link['tag_id']])
+            completions = select_all('task_completions', "id, task_id, notes")
+        except BaseException:
+            with self._lock:
+                self.loading = False
+                self._pending = []
+            raise
+
+        self.build(tasks, completions, task_paths)
+        return {"documents": len(self._docs), "terms": len(self._postings),
+                "seconds": round(time.perf_counter() - start, 3)}
+
+    # Queries
+    def _expand(self, token: str) -> List[Tuple[str, float]]:
+        """The token itself plus up to MAX_EXPANSIONS vocabulary terms it prefixes"""
+        expansions = [(token, 1.0)] if token in self._postings else []
+        start = bisect.bisect_right(self._vocabulary, token)
+        for term in self._vocabulary[start:start + MAX_EXPANSIONS]:
+            if not term.startswith(token):
+                break
+            expansions.append((term, PREFIX_WEIGHT))
+        return expansions
+
+    def search(self, query: str, category: Optional[str] = None, tag: Optional[str] = None,
+               kind: Optional[str] = None, limit: int = 20) -> Tuple[int, List[dict]]:
+        """
+        BM25 search with prefix matching on every query token
+
+        :param tag: Only documents tagged with this path or anything below it
+        :param kind: "task" or "completion"
+        :return total, results: Number of matching documents and the top `limit` of them
+        """
+        with self._lock:
+            documents = len(self._docs)
+            if not documents:
+                return 0, []
+            average_length = self._total_length / documents
+
+            def allowed(key, meta):
+                if kind and key[0] != kind:
+                    return False
+                if category and meta["category"] != category:
+                    return False
+                if tag and not any(path == tag or path.startswith(tag + "/") for path in meta["tag_paths"]):
+                    return False
+                return True
+
+            filtered = bool(kind or category or tag)
+            k1, b = self.k1, self.b
+            scores: Dict[DocKey, float] = {}
+            for token in tokenize(query):
+                for term, weight in self._expand(token):
+                    postings = self._postings[term]
+                    idf = math.log(1 + (documents - len(postings) + 0.5) / (len(postings) + 0.5))
+                    for key, frequency in postings.items():
+                        meta = self._docs[key]
+                        if filtered and not allowed(key, meta):
+                            continue
+                        norm = frequency * (k1 + 1) / (frequency + k1 * (1 - b + b * meta["length"] / average_length))
+                        scores[key] = scores.get(key, 0.0) + weight * idf * norm
+
+            ranked = heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+            return len(scores), [{
+                "kind": key[0],
+                "id": key[1],
+                "task_id": self._docs[key]["task_id"],
+                "title": self._docs[key]["title"],
+                "snippet": (self._docs[key]["description"] or "")[:160],
+                "category": self._docs[key]["category"],
+                "tag_paths": self._docs[key]["tag_paths"],
+                "score": round(score, 4)
+            } for key, score in ranked]
+
+
+# The index shared by every endpoint in this process
+index = SearchIndex()
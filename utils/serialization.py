@@ -0,0 +1,81 @@
+import os, json, gzip
+from typing import Any, List, Optional
+from fastapi import Request
+from fastapi.responses import Response
+from pydantic import TypeAdapter
+from utils.data import TaskResponse, CompletionResponse
+
+# orjson / brotli are optional: fall back to the stdlib encoder and gzip when they aren't installed
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Only compress bodies worth compressing (small ones get bigger and cost CPU)
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "2048"))
+
+# Re-validate database rows against the response models before sending (debugging aid, slow)
+VALIDATE_RESPONSES = bool(os.getenv("VALIDATE_RESPONSES"))
+
+# Prebuilt once at import instead of per request
+TASK_LIST = TypeAdapter(List[TaskResponse])
+COMPLETION_LIST = TypeAdapter(List[CompletionResponse])
+
+
+def dumps(content: Any) -> bytes:
+    """Encode to compact JSON bytes (orjson when available)"""
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+
+
+def loads(content: bytes) -> Any:
+    """Decode JSON bytes (orjson when available)"""
+    if orjson is not None:
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+def trusted(rows: List[dict], adapter: Optional[TypeAdapter] = None) -> List[dict]:
+    """
+    Rows already shaped by the database are sent as-is; with VALIDATE_RESPONSES set they are
+    run through the prebuilt adapter first so that schema drift shows up as a 500
+
+    :param rows: Plain dicts, one per response item
+    :param adapter: The TypeAdapter of the endpoint's response_model
+    """
+    if VALIDATE_RESPONSES and adapter is not None:
+        return adapter.dump_python(adapter.validate_python(rows), mode="json")
+    return rows
+
+
+def json_response(content: Any, request: Optional[Request] = None, status_code: int = 200,
+                  headers: Optional[dict] = None) -> Response:
+    """
+    Fast-path JSON response: no response_model re-validation, one encode, and brotli/gzip
+    for large bodies when the client accepts it
+
+    :param content: Anything orjson / json can encode
+    :param request: The incoming request (used for Accept-Encoding)
+    """
+    body = dumps(content)
+    headers = dict(headers or {})
+
+    if request is not None:
+        headers["Vary"] = "Accept-Encoding"
+
+    if request is not None and len(body) >= COMPRESS_MIN_BYTES:
+        accepted = request.headers.get("accept-encoding", "")
+        if brotli is not None and "br" in accepted:
+            body = brotli.compress(body, quality=4)
+            headers["Content-Encoding"] = "br"
+        elif "gzip" in accepted:
+            body = gzip.compress(body, compresslevel=5)
+            headers["Content-Encoding"] = "gzip"
+
+    return Response(content=body, status_code=status_code, headers=headers, media_type="application/json")
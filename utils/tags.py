@@ -1,13 +1,7 @@
 import os, json, re
-from supabase import Client, create_client
-from anthropic import Anthropic
 from typing import List
-
-# Make the connection to Supabase instance
-supabase: Client = create_client(
-    os.getenv("SUPABASE_URL"),
-    os.getenv("SUPABASE_KEY")
-)
+from utils.clients import get_supabase, get_anthropic, select_all
+from utils.metrics import track
 
 def build_hierarchy_string(tags):
     """Convert flat tag list into readable hierarchy paths"""
@@ -56,17 +50,18 @@ def build_hierarchy_string(tags):
 
 
 
-async def auto_tag_task(task_data) -> List[str]:
+def auto_tag_task(task_data) -> List[str]:
     """
     Given an input task, figure out what tags should be associated with it, and return it as a List of strings where each entry is a tag in hierarchical order
+    Blocking (the LLM call and the tag lookups), so callers run it in a worker thread, e.g. through Limiter.run
 
     :param task_data: The task which is to be created by the backend
     :return tag_list: The list of tags in hierarchial order
     """
-    client = Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
+    client = get_anthropic()
     
  # Get existing tags for context
-    existing_tags = supabase.table('tags').select("*").eq('category', task_data['category']).execute().data
+    existing_tags = select_all('tags', where=lambda query: query.eq('category', task_data['category']))
     tags_hierarchy = build_hierarchy_string(existing_tags)
     
     prompt = f"""
@@ -84,11 +79,12 @@ async def auto_tag_task(task_data) -> List[str]:
         Example response: ["Computer Science/Web Development/Frontend Development/React Components"], ["Computer Science/Web Development/Frontend Development/Vite"]
     """
  # What say you, Mr. Claude?
-    response = client.messages.create(
-        model="claude-sonnet-4-20250514",  # Fast & cheap
-        max_tokens=200,
-        messages=[{"role": "user", "content": prompt}]
-    )
+    with track("anthropic", "messages.create"):
+        response = client.messages.create(
+            model="claude-sonnet-4-20250514",  # Fast & cheap
+            max_tokens=200,
+            messages=[{"role": "user", "content": prompt}]
+        )
 
     response_text = response.content[0].text 
     json_match = re.search(r'\[.*?\]', response_text, re.DOTALL)
@@ -122,14 +118,14 @@ def ensure_tag_exists(path, category):
         
         if parent_id is None:
             # Root level tag
-            existing = supabase.table('tags').select("*").eq(
+            existing = get_supabase().table('tags').select("*").eq(
                 'name', part
             ).is_('parent_tag_id', 'null').eq(
                 'category', category
             ).execute()
         else:
             # Child tag
-            existing = supabase.table('tags').select("*").eq(
+            existing = get_supabase().table('tags').select("*").eq(
                 'name', part
             ).eq('parent_tag_id', parent_id).execute()
         
@@ -139,7 +135,7 @@ def ensure_tag_exists(path, category):
         else:
             print(f"\n'{part}' doesn't exist. Creating with parent_id={parent_id}")
             # Create new tag
-            new_tag = supabase.table('tags').insert({
+            new_tag = get_supabase().table('tags').insert({
                 'name': part,
                 'parent_tag_id': parent_id,  # None for root, or parent's ID
                 'category': category
@@ -152,7 +148,7 @@ def ensure_tag_exists(path, category):
 
 
 def get_tag_by_id(tag_id):
-    tag = supabase.table('tags').select("*").eq(
+    tag = get_supabase().table('tags').select("*").eq(
         'id', tag_id
     ).execute()
 
@@ -161,6 +157,32 @@ def get_tag_by_id(tag_id):
 
     return None
 
+def tag_paths_by_id(tags):
+    """
+    Build the full path of every tag in a flat tag list in one pass (no extra queries)
+
+    :param tags: A list of rows from the tags table
+    :return paths: A dict of tag_id -> "Parent/Child/Leaf" path
+    """
+    tag_dict = {tag['id']: tag for tag in tags}
+    paths = {}
+
+    def resolve(tag_id):
+        if tag_id in paths:
+            return paths[tag_id]
+        tag = tag_dict.get(tag_id)
+        if not tag:
+            return ""
+        parent_id = tag.get('parent_tag_id')
+        parent_path = resolve(parent_id) if parent_id else ""
+        paths[tag_id] = f"{parent_path}/{tag['name']}" if parent_path else tag['name']
+        return paths[tag_id]
+
+    for tag in tags:
+        resolve(tag['id'])
+
+    return paths
+
 def get_tag_path(tag_id):
     """Build full path for a tag by traversing up the hierarchy"""
     path_parts = []
@@ -179,7 +201,7 @@ def get_tag_path(tag_id):
 
 
 if __name__=="__main__":
-    task = supabase.table("tasks").select("*").eq(
+    task = get_supabase().table("tasks").select("*").eq(
         "id", 20
     ).execute()
 